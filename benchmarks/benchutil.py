@@ -0,0 +1,59 @@
+# Utilities shared by the benchmarks
+
+from __future__ import print_function
+
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from estraier_tuning import percentile
+
+def latency_stats(values):
+    """Summarize latencies in seconds.
+    The return value is a hash object of the count, the mean, p50 and p99, in milliseconds.
+    """
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) * 1000.0 / len(values),
+        "p50_ms": percentile(values, 0.50) * 1000.0,
+        "p99_ms": percentile(values, 0.99) * 1000.0,
+    }
+
+def timed(func, *args):
+    """Call a function and measure the elapsed time.
+    The return value is a pair of the elapsed seconds and the return value of the function.
+    """
+    start = time.perf_counter()
+    rv = func(*args)
+    return time.perf_counter() - start, rv
+
+def environment():
+    """Get a description of the environment for reports.
+    """
+    import estraier_lib
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "eager": estraier_lib.libestraier.eager,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def write_report(report, path):
+    """Write a report as JSON.
+    `path' specifies the path of the output file.  If it is `None' or "-", the standard output is
+    used.
+    """
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if not path or path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,119 @@
+#! /usr/local/bin/python
+# -*- coding: utf-8 -*-
+# Measure import time, open latency for each tuning mode, and first versus warm query latency.
+# The report is written as JSON, so that runs of different versions or of lazy and eager
+# binding (ESTRAIER_EAGER=1) can be compared.
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import benchutil
+
+MODULES = ["estraier_lib", "cabin_raw", "estraier_raw", "estraier_c"]
+
+IMPORT_CHILD = """
+import sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+def measure_import(module, eager, repeat):
+    env = dict(os.environ)
+    env["ESTRAIER_EAGER"] = "1" if eager else "0"
+    env["PYTHONPATH"] = benchutil.ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    times = []
+    for i in range(repeat):
+        proc = subprocess.Popen([sys.executable, "-c", IMPORT_CHILD, module], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            return {"error": err.decode("utf-8", "replace").strip().splitlines()[-1]}
+        times.append(float(out))
+    return benchutil.latency_stats(times)
+
+def make_casket(path, mode, docnum):
+    from estraier_c import Document, Database
+    db = Database()
+    if not db.open(path, Database.DBWRITER | Database.DBCREAT | mode):
+        return False
+    docs = []
+    for i in range(docnum):
+        doc = Document()
+        doc.add_attr("@uri", "bench:%d" % i)
+        doc.add_attr("@title", "document %d" % i)
+        doc.add_text("rainbow lullaby number %d in the sample corpus" % i)
+        docs.append(doc)
+    db.put_docs(docs, Database.PDCLEAN)
+    return db.close()
+
+def measure_mode(path, repeat, queries):
+    from estraier_c import Condition, Database
+    opens = []
+    for i in range(repeat):
+        db = Database()
+        elapsed, ok = benchutil.timed(db.open, path, Database.DBREADER)
+        if not ok:
+            return {"error": "open failed"}
+        opens.append(elapsed)
+        db.close()
+    db = Database()
+    db.open(path, Database.DBREADER)
+    cond = Condition()
+    cond.set_phrase("rainbow AND lullaby")
+    first, result = benchutil.timed(db.search, cond)
+    warm = [benchutil.timed(db.search, cond)[0] for i in range(queries)]
+    db.close()
+    # a fresh reader warmed up by a query log not including the measured query
+    db = Database()
+    db.open(path, Database.DBREADER)
+    warm_up = db.warm_up(["rainbow", "lullaby", "sample corpus"])
+    warmed_first = benchutil.timed(db.search, cond)[0]
+    db.close()
+    return {
+        "open": benchutil.latency_stats(opens),
+        "first_query_ms": first * 1000.0,
+        "warm_query": benchutil.latency_stats(warm),
+        "warm_up": warm_up,
+        "warmed_first_query_ms": warmed_first * 1000.0,
+        "hits": result.doc_num(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="startup benchmark of pyperestraier")
+    parser.add_argument("--output", default="-", help="path of the JSON report")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of each measurement")
+    parser.add_argument("--queries", type=int, default=100, help="number of warm queries")
+    parser.add_argument("--docs", type=int, default=1000, help="documents in each casket")
+    parser.add_argument("--skip-db", action="store_true",
+                        help="measure import time only, without the native library")
+    args = parser.parse_args()
+
+    report = {"environment": benchutil.environment(), "import": {}}
+    for eager in (False, True):
+        binding = "eager" if eager else "lazy"
+        report["import"][binding] = dict(
+            (module, measure_import(module, eager, args.repeat)) for module in MODULES)
+
+    if not args.skip_db:
+        from estraier_c import Database
+        modes = ["DBSMALL", "DBLARGE", "DBHUGE", "DBHUGE2", "DBHUGE3"]
+        report["modes"] = {}
+        tmpdir = tempfile.mkdtemp(prefix="estbench")
+        try:
+            for name in modes:
+                path = os.path.join(tmpdir, name)
+                if not make_casket(path, getattr(Database, name), args.docs):
+                    report["modes"][name] = {"error": "casket creation failed"}
+                    continue
+                report["modes"][name] = measure_mode(path, args.repeat, args.queries)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    benchutil.write_report(report, args.output)
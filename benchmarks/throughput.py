@@ -0,0 +1,232 @@
+#! /usr/local/bin/python
+# -*- coding: utf-8 -*-
+# Measure indexing and search throughput over a deterministic synthetic corpus.
+# The corpus is generated from a seed, so runs on different machines or versions index exactly
+# the same documents.  The report is written as JSON.
+
+from __future__ import print_function
+
+import argparse
+import bisect
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import benchutil
+
+SIZES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+
+SYLLABLES = ["ka", "ri", "to", "me", "su", "no", "ha", "ze", "lo", "pa", "ven", "dor",
+             "ix", "al", "mun", "sel", "tra", "gio", "bel", "ron"]
+
+CATEGORIES = ["hotel", "ryokan", "hostel", "resort", "apartment", "villa"]
+
+class Corpus(object):
+    """Deterministic synthetic corpus.
+    Words follow a Zipf distribution over a generated vocabulary, so that posting lists have
+    realistic skew, and each document has typical system and custom attributes.
+    """
+
+    def __init__(self, docnum, seed=19780211, vocabulary=50000):
+        self.docnum = docnum
+        self.seed = seed
+        rnd = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(rnd.choice(SYLLABLES) for i in range(rnd.randint(2, 4))))
+        self.words = sorted(words)
+        rnd.shuffle(self.words)
+        total = 0.0
+        self._cumweights = []
+        for rank in range(1, vocabulary + 1):
+            total += 1.0 / rank
+            self._cumweights.append(total)
+
+    def word(self, rnd):
+        point = rnd.random() * self._cumweights[-1]
+        return self.words[bisect.bisect_left(self._cumweights, point)]
+
+    def documents(self):
+        """Generate document objects.
+        """
+        from estraier_c import Document
+        rnd = random.Random(self.seed + 1)
+        base = 1262304000 # 2010-01-01
+        for i in range(self.docnum):
+            doc = Document()
+            doc.add_attr("@uri", "http://bench.example.com/%d/%d.html" % (i % 997, i))
+            doc.add_attr("@title", " ".join(self.word(rnd) for j in range(rnd.randint(2, 6))))
+            doc.add_attr("@mdate", time.strftime("%Y-%m-%dT%H:%M:%SZ",
+                                                 time.gmtime(base + rnd.randint(0, 300000000))))
+            doc.add_attr("@author", "author%d" % int(rnd.paretovariate(1.2)))
+            doc.add_attr("price", "%d" % rnd.randint(20, 900))
+            doc.add_attr("category", rnd.choice(CATEGORIES))
+            for j in range(rnd.randint(1, 8)):
+                doc.add_text(" ".join(self.word(rnd) for k in range(rnd.randint(5, 25))))
+            yield doc
+
+    def phrases(self, num):
+        """Generate search phrases of one or two frequent-enough words.
+        """
+        rnd = random.Random(self.seed + 2)
+        for i in range(num):
+            if rnd.random() < 0.5:
+                yield self.word(rnd)
+            else:
+                yield "%s AND %s" % (self.word(rnd), self.word(rnd))
+
+def memory():
+    from estraier_raw import est_memory_usage
+    return {
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "est_memory_usage": est_memory_usage(),
+    }
+
+def disk_usage(path):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+def bench_index(path, corpus, omode):
+    from estraier_c import Database
+    db = Database()
+    if not db.open(path, Database.DBWRITER | Database.DBCREAT | omode):
+        return {"error": "open failed"}
+    latencies = []
+    failed = 0
+    start = time.perf_counter()
+    for doc in corpus.documents():
+        elapsed, ok = benchutil.timed(db.put_doc, doc, Database.PDCLEAN)
+        latencies.append(elapsed)
+        if not ok:
+            failed += 1
+    # the rate excludes the time to generate the corpus
+    elapsed = sum(latencies)
+    report = {
+        "docs": corpus.docnum,
+        "failed": failed,
+        "docs_per_sec": corpus.docnum / elapsed if elapsed > 0 else None,
+        "wall_sec": time.perf_counter() - start,
+        "put_doc": benchutil.latency_stats(latencies),
+    }
+    report["flush_sec"] = benchutil.timed(db.flush, 0)[0]
+    report["sync_sec"] = benchutil.timed(db.sync)[0]
+    report["optimize_sec"] = benchutil.timed(db.optimize, 0)[0]
+    report["size"] = db.size()
+    report["disk_bytes"] = disk_usage(path)
+    report["memory"] = memory()
+    db.close()
+    return report
+
+def bench_search(path, corpus, queries, fetches):
+    from estraier_c import Condition, Database
+    db = Database()
+    if not db.open(path, Database.DBREADER):
+        return {"error": "open failed"}
+    report = {}
+    hits = []
+    phrases = list(corpus.phrases(queries))
+    for name in ("SURE", "USUAL", "FAST", "AGITO"):
+        latencies = []
+        for phrase in phrases:
+            cond = Condition()
+            cond.set_phrase(phrase)
+            cond.set_options(getattr(Condition, name))
+            elapsed, result = benchutil.timed(db.search, cond)
+            latencies.append(elapsed)
+            if result.doc_num() > 0:
+                hits.append(result.get_doc_id(0))
+        total = sum(latencies)
+        report[name] = benchutil.latency_stats(latencies)
+        report[name]["queries_per_sec"] = len(latencies) / total if total > 0 else None
+    rnd = random.Random(corpus.seed + 3)
+    latencies = []
+    for i in range(fetches if hits else 0):
+        latencies.append(benchutil.timed(db.get_doc, rnd.choice(hits), 0)[0])
+    report["get_doc"] = benchutil.latency_stats(latencies)
+    report["memory"] = memory()
+    db.close()
+    return report
+
+def bench_edit(path, corpus, edits):
+    """Compare updating one attribute with `edit_attrs' and with `put_doc'.
+    """
+    from estraier_c import Database
+    db = Database()
+    if not db.open(path, Database.DBWRITER):
+        return {"error": "open failed"}
+    rnd = random.Random(corpus.seed + 4)
+    ids = []
+    for i in range(edits):
+        id = db.uri_to_id("http://bench.example.com/%d/%d.html" % (i % 997, i))
+        if id > 0:
+            ids.append(id)
+    report = {}
+    latencies = []
+    for id in ids:
+        update = {id: {"price": "%d" % rnd.randint(20, 900)}}
+        latencies.append(benchutil.timed(db.edit_attrs, update)[0])
+    report["edit_attrs"] = benchutil.latency_stats(latencies)
+    latencies = []
+    for id in ids:
+        doc = db.get_doc(id, 0)
+        if doc is None:
+            continue
+        doc.add_attr("price", "%d" % rnd.randint(20, 900))
+        latencies.append(benchutil.timed(db.put_doc, doc, Database.PDCLEAN)[0])
+    report["put_doc"] = benchutil.latency_stats(latencies)
+    db.close()
+    return report
+
+def parse_size(text):
+    if text.lower() in SIZES:
+        return SIZES[text.lower()]
+    return int(text)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="throughput benchmark of pyperestraier")
+    parser.add_argument("--sizes", default="10k",
+                        help="comma-separated corpus sizes: 10k, 1m, 10m or numbers")
+    parser.add_argument("--seed", type=int, default=19780211, help="seed of the corpus")
+    parser.add_argument("--queries", type=int, default=1000, help="queries for each mode")
+    parser.add_argument("--fetches", type=int, default=1000, help="number of get_doc calls")
+    parser.add_argument("--edits", type=int, default=1000,
+                        help="documents updated by edit_attrs and by put_doc")
+    parser.add_argument("--dir", default=None, help="directory for caskets (kept if given)")
+    parser.add_argument("--output", default="-", help="path of the JSON report")
+    args = parser.parse_args()
+
+    from estraier_c import Database
+    report = {"environment": benchutil.environment(), "runs": {}}
+    tmpdir = args.dir or tempfile.mkdtemp(prefix="estbench")
+    try:
+        for size in args.sizes.split(","):
+            docnum = parse_size(size)
+            omode = 0
+            if docnum >= 10000000:
+                omode = Database.DBHUGE3
+            elif docnum >= 5000000:
+                omode = Database.DBHUGE2
+            elif docnum >= 1000000:
+                omode = Database.DBHUGE
+            elif docnum >= 300000:
+                omode = Database.DBLARGE
+            elif docnum < 50000:
+                omode = Database.DBSMALL
+            corpus = Corpus(docnum, args.seed)
+            path = os.path.join(tmpdir, "casket-%d" % docnum)
+            run = {"index": bench_index(path, corpus, omode)}
+            if "error" not in run["index"]:
+                run["search"] = bench_search(path, corpus, args.queries, args.fetches)
+                run["edit"] = bench_edit(path, corpus, args.edits)
+            report["runs"][size] = run
+    finally:
+        if not args.dir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    benchutil.write_report(report, args.output)
@@ -13,10 +13,10 @@
 # 02111-1307 USA.
 ################################################################################################
 
-from ctypes import CDLL, POINTER, c_int, c_uint, c_long, c_double
+from ctypes import POINTER, c_int, c_uint, c_long, c_double
 from ctypes import c_char_p, c_void_p, c_size_t
 
-libest_raw = CDLL("libestraier.so")
+from estraier_lib import libestraier as libest_raw
 
 ############################################################
 # API
@@ -1326,3 +1326,6 @@ cbmapopenex.__doc__ = \
     "The return value is a map handle."
 cbmapopenex.restype = c_void_p
 cbmapopenex.argtypes = [c_int]
+
+# calls after the first one go to ctypes directly
+libest_raw.rebind(globals())
@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from estraier_c import Database, DatabasePool
+
+class _Call(object):
+    # tracks the database object used by a blocking call, to interrupt it on cancellation
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._db = None
+
+    def enter(self, db):
+        with self._lock:
+            self._db = db
+
+    def leave(self):
+        with self._lock:
+            self._db = None
+
+    def interrupt(self):
+        with self._lock:
+            if self._db:
+                self._db.interrupt()
+
+class AsyncDatabase(object):
+    """asyncio front-end of a database.
+    Blocking native calls run on a dedicated thread pool, each on its own database object
+    checked out from a `DatabasePool', so the event loop is never stalled.  If an awaiting task
+    is cancelled, the native call in progress is interrupted.
+    """
+    _pool = None
+    _executor = None
+
+    def open(self, name, omode, size):
+        """Open a database.
+        `name' specifies the name of a database directory.
+        `omode' specifies open modes as with `Database.open'.  If `Database.DBWRITER' is
+        included, only one database object is opened whatever `size' is.
+        `size' specifies the number of database objects and of threads.
+        The return value is true if success, else it is false.
+        """
+        if omode & Database.DBWRITER:
+            size = 1
+        pool = DatabasePool()
+        if not pool.open(name, omode, size):
+            return False
+        self._pool = pool
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=size)
+        return True
+
+    def close(self):
+        """Close the database.
+        Calls in progress are waited for.
+        The return value is true if success, else it is false.
+        """
+        if not self._pool:
+            return True
+        self._executor.shutdown(wait=True)
+        rv = self._pool.close()
+        self._pool = None
+        self._executor = None
+        return rv
+
+    def refresh(self):
+        """Reopen database objects to see updates synchronized by another writer.
+        """
+        self._pool.refresh()
+
+    async def _call(self, func, *args):
+        call = _Call()
+
+        def job():
+            with self._pool.checkout() as db:
+                call.enter(db)
+                try:
+                    return func(db, *args)
+                finally:
+                    call.leave()
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, job)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            call.interrupt()
+            raise
+
+    async def search(self, cond, copy=True, hints=True):
+        """Search for documents corresponding a condition.
+        The arguments and the return value are the same as `Database.search'.
+        """
+        return await self._call(Database.search, cond, copy, hints)
+
+    async def get_doc(self, id, options):
+        """Retrieve a document.
+        The arguments and the return value are the same as `Database.get_doc'.
+        """
+        return await self._call(Database.get_doc, id, options)
+
+    async def get_docs(self, ids, attrs=None, texts=False):
+        """Retrieve documents in one blocking call.
+        The arguments and the return value are the same as `Database.get_docs'.
+        """
+        return await self._call(Database.get_docs, list(ids), attrs, texts)
+
+    async def get_doc_attr(self, id, name):
+        """Retrieve the value of an attribute of a document.
+        The arguments and the return value are the same as `Database.get_doc_attr'.
+        """
+        return await self._call(Database.get_doc_attr, id, name)
+
+    async def put_doc(self, doc, options):
+        """Add a document.
+        The database should be opened as a writer.
+        The arguments and the return value are the same as `Database.put_doc'.
+        """
+        return await self._call(Database.put_doc, doc, options)
+
+    async def out_doc(self, id, options):
+        """Remove a document.
+        The database should be opened as a writer.
+        The arguments and the return value are the same as `Database.out_doc'.
+        """
+        return await self._call(Database.out_doc, id, options)
+
+    async def search_docs(self, cond, attrs=None, texts=False, page=100):
+        """Iterate over documents corresponding a condition with `async for'.
+        `cond' specifies a condition object.
+        `attrs' and `texts' specify what to retrieve as with `Database.get_docs'.
+        `page' specifies the number of documents retrieved in each blocking call.
+        Each value is an element as returned by `Database.get_docs'.  Documents removed after
+        the search are skipped.
+        """
+        result = await self.search(cond, hints=False)
+        for start in range(0, result.doc_num(), page):
+            docs = await self.get_docs(result.get_doc_ids(start, start + page), attrs, texts)
+            for doc in docs:
+                if doc:
+                    yield doc
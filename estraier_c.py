@@ -1,9 +1,219 @@
+import array
+import collections
+import contextlib
 import ctypes
+import hashlib
+import heapq
+import queue
+import threading
+import time
 
 from estraier_raw import *
 from cabin_raw import *
 
-libc = ctypes.CDLL("libc.so")
+from estraier_lib import libc
+libc.free.restype = None
+libc.free.argtypes = [ctypes.c_void_p]
+
+# prototypes returning regions allocated with `malloc', which are released with `free'
+_est_db_get_doc_attr = libest_raw["est_db_get_doc_attr"]
+_est_db_get_doc_attr.restype = ctypes.c_void_p
+_est_db_get_doc_attr.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_char_p]
+_est_db_word_iter_next = libest_raw["est_db_word_iter_next"]
+_est_db_word_iter_next.restype = ctypes.c_void_p
+_est_db_word_iter_next.argtypes = [ctypes.c_void_p]
+_est_db_keyword_iter_next = libest_raw["est_db_keyword_iter_next"]
+_est_db_keyword_iter_next.restype = ctypes.c_void_p
+_est_db_keyword_iter_next.argtypes = [ctypes.c_void_p]
+_est_doc_make_snippet = libest_raw["est_doc_make_snippet"]
+_est_doc_make_snippet.restype = ctypes.c_void_p
+_est_doc_make_snippet.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
+                                  ctypes.c_int, ctypes.c_int, ctypes.c_int]
+_est_str_make_snippet = libest_raw["est_str_make_snippet"]
+_est_str_make_snippet.restype = ctypes.c_void_p
+_est_str_make_snippet.argtypes = [ctypes.c_char_p, ctypes.c_void_p,
+                                  ctypes.c_int, ctypes.c_int, ctypes.c_int]
+_est_doc_cat_texts = libest_raw["est_doc_cat_texts"]
+_est_doc_cat_texts.restype = ctypes.c_void_p
+_est_doc_cat_texts.argtypes = [ctypes.c_void_p]
+_est_doc_dump_draft = libest_raw["est_doc_dump_draft"]
+_est_doc_dump_draft.restype = ctypes.c_void_p
+_est_doc_dump_draft.argtypes = [ctypes.c_void_p]
+_cblistdump = libest_raw["cblistdump"]
+_cblistdump.restype = ctypes.c_void_p
+_cblistdump.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+libest_raw.rebind(globals())
+libc.rebind(globals())
+
+def _cbmap_to_dict(mapNative):
+    # decode keys and values of a map object into a hash object
+    rv = {}
+    keylistNative = cbmapkeys(mapNative)
+    for i in range(cblistnum(keylistNative)):
+        keyNative = cblistval(keylistNative, i, None)
+        valueNative = cbmapget(mapNative, keyNative, -1, None)
+        rv[keyNative.decode("utf-8")] = valueNative.decode("utf-8")
+    cblistclose(keylistNative)
+    return rv
+
+def _dict_to_cbmap(value):
+    # the returned map object should be closed with `cbmapclose'
+    mapNative = cbmapopenex(max(len(value), 31))
+    for key in value:
+        cbmapput(mapNative, key.encode("utf-8"), -1, ("%s" % value[key]).encode("utf-8"), -1, 1)
+    return mapNative
+
+def _numpy():
+    # NumPy is optional
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _take_string(ptr):
+    # decode a string allocated by the native library and release it
+    if not ptr:
+        return None
+    value = ctypes.string_at(ptr).decode("utf-8")
+    libc.free(ptr)
+    return value
+
+def _words_to_cblist(words):
+    # the returned list object should be closed with `cblistclose'
+    if isinstance(words, Result):
+        hintsNative = words._hintsNative
+        if hintsNative:
+            return est_hints_to_words(hintsNative)
+        hintsNative = _dict_to_cbmap(words._hints)
+        wordsNative = est_hints_to_words(hintsNative)
+        cbmapclose(hintsNative)
+        return wordsNative
+    wordsNative = cblistopen()
+    for w in words:
+        cblistpush(wordsNative, w.encode("utf-8"), -1)
+    return wordsNative
+
+def _read_vnum(buf, pos):
+    # read a variable length number serialized by QDBM: 7 bits per byte, little endian, and
+    # every byte but the last one is stored as a negative number
+    num = 0
+    base = 1
+    while True:
+        c = buf[pos]
+        pos += 1
+        if c < 128:
+            return num + c * base, pos
+        num += (256 - c - 1) * base
+        base <<= 7
+
+def _parse_listdump(buf, num):
+    # parse the result of `cblistdump', which is the number of elements followed by the size
+    # and the region of each element, into pairs of offsets, or return `None' if it does not
+    # match the expected number of elements
+    try:
+        count, pos = _read_vnum(buf, 0)
+        if count != num:
+            return None
+        spans = []
+        for i in range(count):
+            size, pos = _read_vnum(buf, pos)
+            spans.append((pos, pos + size))
+            pos += size
+    except IndexError:
+        return None
+    if pos != len(buf):
+        return None
+    return spans
+
+class Tokens(object):
+    """Tokens of texts stored in one flat buffer.
+    `buffer' is the UTF-8 bytes of all tokens concatenated.  `offsets' is an array of integers
+    where the token at index `i' is `buffer[offsets[i]:offsets[i+1]]'.  `text_offsets' is an
+    array of integers where the tokens of the text at index `j' are those from
+    `text_offsets[j]' to `text_offsets[j+1]'.
+    """
+    
+    def __init__(self):
+        self.buffer = b""
+        self.offsets = array.array("q", [0])
+        self.text_offsets = array.array("q", [0])
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.token(i)
+    
+    def token(self, index):
+        """Get a token.
+        `index' specifies the index of a token.
+        The return value is the token.
+        """
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+    
+    def text_tokens(self, index):
+        """Get tokens of a text.
+        `index' specifies the index of a text.
+        The return value is an array of tokens of the text.
+        """
+        return [self.token(i)
+                for i in range(self.text_offsets[index], self.text_offsets[index + 1])]
+
+class _NativeBuffer(object):
+    """Owner of a region allocated with `malloc' by the native library.
+    The region is released with `free' when the owner is collected.
+    """
+    def __init__(self, ptr):
+        self._ptr = ptr
+    
+    def __del__(self):
+        if self._ptr:
+            libc.free(self._ptr)
+            self._ptr = None
+    
+    def view(self, num):
+        """Get a memoryview of `num' integers over the region without copying.
+        The view keeps the owner alive.
+        """
+        if not self._ptr:
+            return memoryview(b"").cast("i")
+        array = (ctypes.c_int * num).from_address(ctypes.addressof(self._ptr.contents))
+        array._owner = self
+        return memoryview(array).cast("B").cast("i")
+
+def _draft_field(value):
+    # a line break would start a new record of draft data
+    return value.replace("\r", " ").replace("\n", " ")
+
+def _to_draft(doc):
+    # get draft data of a document object or of draft data in UTF-8
+    if isinstance(doc, Document):
+        doc = doc.dump_draft()
+    if not isinstance(doc, bytes):
+        doc = doc.encode("utf-8")
+    return doc
+
+# attributes ignored by digests, since they are set by the database or by the digest itself
+_DIGEST_IGNORED = (b"@id=", b"@digest=")
+
+def _split_draft(draft):
+    # split draft data into an array of attribute lines and the rest beginning with the blank line
+    lines = draft.split(b"\n")
+    for i in range(len(lines)):
+        if not lines[i].rstrip(b"\r"):
+            return lines[:i], b"\n".join(lines[i:])
+    return lines, b""
+
+def _draft_digest(header, body):
+    # the order of attributes does not matter
+    md5 = hashlib.md5()
+    for line in sorted(line for line in header if not line.startswith(_DIGEST_IGNORED)):
+        md5.update(line)
+        md5.update(b"\n")
+    md5.update(body)
+    return md5.hexdigest()
 
 class Document(object):
     """Document class for hyperestraier.
@@ -87,7 +297,7 @@ class Document(object):
         """Concatenate sentences of the text of a document object.
         The return value is concatenated sentences.
         """
-        pass
+        return " ".join(self._texts)
     
     def keywords(self):
         """Get attached keywords.
@@ -98,7 +308,8 @@ class Document(object):
     
     def make_snippet(self, words, wwidth, hwidth, awidth):
         """Make a snippet of the body text.
-        `words' specifies an array object of words to be highlight.
+        `words' specifies an array object of words to be highlight, or a result object whose
+        hints are used as with `Database.make_snippets'.
         `wwidth' specifies whole width of the result.
         `hwidth' specifies width of strings picked up from the beginning of the text.
         `awidth' width of strings picked up around each highlighted word.
@@ -108,17 +319,51 @@ class Document(object):
         and the second field means its normalized form.
         """
         docNative = self.toNative()
-        wordsNative = cblistopen()
-        for w in words:
-            cblistpush(wordsNative, w.encode("utf-8"), -1)
-        snippetNative = est_doc_make_snippet(docNative, wordsNative,
-                                             wwidth, hwidth, awidth)
+        wordsNative = _words_to_cblist(words)
+        snippet = _take_string(_est_doc_make_snippet(docNative, wordsNative,
+                                                     wwidth, hwidth, awidth))
         cblistclose(wordsNative)
-        snippet = ctypes.string_at(snippetNative).decode("utf-8")
-        libc.free(snippetNative)
         self.deleteNative(docNative)
         return snippet
 
+    def dump_draft(self):
+        """Dump draft data of a document object.
+        The return value is draft data of the document object.  It can be passed to
+        `Database.put_docs' as is, encoded in UTF-8 or not.
+        """
+        lines = []
+        for key in self._attr:
+            value = self._attr[key]
+            if value is not None:
+                lines.append(_draft_field(key) + "=" + _draft_field(value))
+        if self._keywords:
+            vector = [ESTDCNTLVECTOR]
+            for key in self._keywords:
+                vector.append(_draft_field(key).replace("\t", " "))
+                vector.append(_draft_field(self._keywords[key]).replace("\t", " "))
+            lines.append("\t".join(vector))
+        if self._score is not None and self._score >= 0:
+            lines.append("%s\t%d" % (ESTDCNTLSCORE, self._score))
+        lines.append("")
+        for text1 in self._texts:
+            text1 = _draft_field(text1).lstrip()
+            if text1:
+                lines.append(text1)
+        for text1 in self._hidden_texts:
+            text1 = _draft_field(text1).lstrip()
+            if text1:
+                lines.append("\t" + text1)
+        lines.append("")
+        return "\n".join(lines)
+    
+    def digest(self):
+        """Get the digest of the content.
+        The return value is the MD5 hash in hexadecimal of the draft data, where the order of
+        attributes is normalized and the attributes "@id" and "@digest" are ignored.  It is
+        stored as the attribute "@digest" by incremental registration.
+        """
+        return _draft_digest(*_split_draft(_to_draft(self)))
+    
     def fromNative(self, docNative):
         self._id = est_doc_id(docNative)
         self._score = est_doc_score(docNative)
@@ -133,6 +378,10 @@ class Document(object):
         textsNum = cblistnum(textsNative)
         self._texts = [ cblistval(textsNative, i, None).decode("utf8") for i in range(textsNum) ]
         self._hidden_texts = [est_doc_hidden_texts(docNative).decode("utf-8")]
+        # keywords
+        kwordsNative = est_doc_keywords(docNative)
+        if kwordsNative:
+            self._keywords = _cbmap_to_dict(kwordsNative)
     
     def toNative(self):
         docNative = est_doc_new()
@@ -140,9 +389,9 @@ class Document(object):
             est_doc_set_score(docNative, self._score)
         # attr
         for key in self._attr:
-            est_doc_add_attr(docNative,
-                             key.encode("utf-8"),
-                             self._attr[key].encode("utf-8"))
+            value = self._attr[key]
+            if value is not None:
+                est_doc_add_attr(docNative, key.encode("utf-8"), value.encode("utf-8"))
         # texts
         for text1 in self._texts:
             est_doc_add_text(docNative, text1.encode("utf-8"))
@@ -150,10 +399,7 @@ class Document(object):
             est_doc_add_hidden_text(docNative, text1.encode("utf-8"))
         # keywords
         if self._keywords:
-            cbmapkw = cbmapopen()
-            for key in self._keywords:
-                cbmapput(cbmapkw, key.encode("utf-8"), -1,
-                         value.encode("utf-8"), -1, 1)
+            cbmapkw = _dict_to_cbmap(self._keywords)
             est_doc_set_keywords(docNative, cbmapkw)
             cbmapclose(cbmapkw)
         return docNative
@@ -161,6 +407,124 @@ class Document(object):
     def deleteNative(self, docNative):
         est_doc_delete(docNative)
 
+class NativeDocument(Document):
+    """Document backed by a native document object.
+    Attributes and texts are read from the native object on each access, so a document which is
+    only partly inspected costs almost nothing.  The native object is deleted with the document
+    object.
+    """
+    _docNative = None
+    
+    def __init__(self, docNative):
+        # the document object takes the ownership of `docNative'
+        self._docNative = docNative
+        self._id = est_doc_id(docNative)
+    
+    def __del__(self):
+        if self._docNative:
+            est_doc_delete(self._docNative)
+            self._docNative = None
+    
+    def add_attr(self, name, value):
+        """Add an attribute.
+        `name' specifies the name of an attribute.
+        `value' specifies the value of the attribute.  If it is `None', the attribute is removed.
+        """
+        est_doc_add_attr(self._docNative, name.encode("utf-8"),
+                         value.encode("utf-8") if value is not None else None)
+    
+    def add_text(self, text):
+        """Add a sentence of text.
+        `text' specifies a sentence of text.
+        """
+        est_doc_add_text(self._docNative, text.encode("utf-8"))
+    
+    def add_hidden_text(self, text):
+        """Add a hidden sentence.
+        `text' specifies a hidden sentence.
+        """
+        est_doc_add_hidden_text(self._docNative, text.encode("utf-8"))
+    
+    def set_keywords(self, kwords):
+        """Attach keywords.
+        `kwords' specifies a hash object of keywords.  Keys of the hash should be keywords of the
+        document and values should be their scores in decimal string.
+        """
+        kwordsNative = _dict_to_cbmap(kwords)
+        est_doc_set_keywords(self._docNative, kwordsNative)
+        cbmapclose(kwordsNative)
+    
+    def set_score(self, score):
+        """Set the substitute score.
+        `score' specifies the substitute score.  It it is negative, the substitute score setting is
+        nullified.
+        """
+        est_doc_set_score(self._docNative, score)
+    
+    def attr_names(self):
+        """Get an array of attribute names of a document object.
+        The return value is an array object of attribute names.
+        """
+        namesNative = est_doc_attr_names(self._docNative)
+        rv = [cblistval(namesNative, i, None).decode("utf-8")
+              for i in range(cblistnum(namesNative))]
+        cblistclose(namesNative)
+        return rv
+    
+    def attr(self, name):
+        """Get the value of an attribute.
+        `name' specifies the name of an attribute.
+        The return value is the value of the attribute or `None' if it does not exist.
+        """
+        value = est_doc_attr(self._docNative, name.encode("utf-8"))
+        if value is None:
+            return None
+        return value.decode("utf-8")
+    
+    def texts(self):
+        """Get an array of sentences of the text.
+        The return value is an array object of sentences of the text.
+        """
+        textsNative = est_doc_texts(self._docNative)
+        return [cblistval(textsNative, i, None).decode("utf-8")
+                for i in range(cblistnum(textsNative))]
+    
+    def cat_texts(self):
+        """Concatenate sentences of the text of a document object.
+        The return value is concatenated sentences.
+        """
+        return _take_string(_est_doc_cat_texts(self._docNative))
+    
+    def keywords(self):
+        """Get attached keywords.
+        The return value is a hash object of keywords and their scores in decimal string.  If no
+        keyword is attached, `None' is returned.
+        """
+        kwordsNative = est_doc_keywords(self._docNative)
+        if not kwordsNative:
+            return None
+        return _cbmap_to_dict(kwordsNative)
+    
+    def make_snippet(self, words, wwidth, hwidth, awidth):
+        """Make a snippet of the body text.
+        The arguments and the return value are the same as `Document.make_snippet'.  The native
+        object is used as is.
+        """
+        wordsNative = _words_to_cblist(words)
+        snippet = _take_string(_est_doc_make_snippet(self._docNative, wordsNative,
+                                                     wwidth, hwidth, awidth))
+        cblistclose(wordsNative)
+        return snippet
+    
+    def dump_draft(self):
+        """Dump draft data of a document object.
+        The return value is draft data of the document object.
+        """
+        return _take_string(_est_doc_dump_draft(self._docNative))
+    
+    def toNative(self):
+        return est_doc_dup(self._docNative)
+
 class Condition(object):
     SURE   = ESTCONDSURE           # check every N-gram key
     USUAL  = ESTCONDUSUAL          # check N-gram keys skipping by one
@@ -185,7 +549,7 @@ class Condition(object):
     _mask = 0
     
     def __init__(self):
-        self.__attr = []
+        self._attr = []
     
     def set_phrase(self, phrase):
         """Set the search phrase.
@@ -262,6 +626,14 @@ class Condition(object):
         """
         self._mask = mask
     
+    def key(self):
+        """Get the canonical key of a condition object.
+        The return value is a hashable tuple which is equal for conditions retrieving the same
+        result.
+        """
+        return (self._phrase, tuple(self._attr), self._order, self._max, self._skip,
+                self._options, self._auxiliary, self._eclipse, self._distinct, self._mask)
+    
     def toNative(self):
         condNative = est_cond_new()
         if self._phrase:
@@ -277,7 +649,7 @@ class Condition(object):
         if self._options:
             est_cond_set_options(condNative, self._options)
         if self._auxiliary:
-            est_cond_set_auxiliary(condNatie, self._auxiliary)
+            est_cond_set_auxiliary(condNative, self._auxiliary)
         if self._eclipse:
             est_cond_set_eclipse(condNative, self._eclipse)
         if self._distinct:
@@ -291,12 +663,20 @@ class Condition(object):
 
 class Result(object):
     _doc_ids = []
+    _dbidxs = []
     _hints = {}
+    _hintsNative = None
     
     def __init__(self):
         self._doc_ids = []
+        self._dbidxs = []
         self._hints = {}
     
+    def __del__(self):
+        if self._hintsNative:
+            cbmapclose(self._hintsNative)
+            self._hintsNative = None
+    
     def doc_num(self):
         """Get the number of documents.
         The return value is the number of documents in the result.
@@ -312,18 +692,39 @@ class Result(object):
             return -1
         return self._doc_ids[index]
     
+    def get_doc_ids(self, start=0, end=None):
+        """Get a range of ID numbers of documents.
+        `start' specifies the index of the first document.
+        `end' specifies the index after the last document.  If it is `None', the range continues
+        to the end of the result.
+        The return value is a sequence of ID numbers.  If the result was retrieved with `copy'
+        disabled, it is a memoryview sharing the native array and nothing is copied.
+        """
+        return self._doc_ids[start:end]
+    
+    def to_numpy(self):
+        """Get ID numbers of documents as a NumPy array.
+        The return value is an array of `numpy.intc'.  If the result was retrieved with `copy'
+        disabled, the array shares the native array and nothing is copied.  NumPy is required.
+        """
+        import numpy
+        return numpy.asarray(self._doc_ids, dtype=numpy.intc)
+    
     def get_dbidx(self, index):
         """Get the index of the container database of a document.
         `index' specifies the index of a document.
         The return value is the index of the container database of the document or -1 if the index
         is out of bounds.
         """
-        pass
+        if len(self._dbidxs) <= index:
+            return -1
+        return self._dbidxs[index]
     
     def hint_words(self):
         """Get an array of hint words.
         The return value is an array of hint words.
         """
+        self._load_hints()
         rv = []
         for key in self._hints.keys():
             if key != "":
@@ -336,7 +737,207 @@ class Result(object):
         The return value is the number of documents corresponding the hint word.  If the word is
         in a negative condition, the value is negative.
         """
+        self._load_hints()
         return self._hints[word]
+    
+    def _load_hints(self):
+        # hints are decoded on the first access, then the native map is released
+        hintsNative = self._hintsNative
+        if not hintsNative:
+            return
+        self._hintsNative = None
+        keylistNative = cbmapkeys(hintsNative)
+        for i in range(cblistnum(keylistNative)):
+            keyNative = cblistval(keylistNative, i, None)
+            valueNative = cbmapget(hintsNative, keyNative, -1, None)
+            self._hints[keyNative.decode("utf-8")] = int(valueNative)
+        cblistclose(keylistNative)
+        cbmapclose(hintsNative)
+
+    def fromNative(self, idsNative, num, hintsNative, meta=False, copy=True):
+        # the result takes the ownership of `hintsNative', and of `idsNative' if `copy' is
+        # disabled
+        if copy:
+            ids = [idsNative[i] for i in range(num * 2 if meta else num)]
+        else:
+            ids = _NativeBuffer(idsNative).view(num * 2 if meta else num)
+        if meta:
+            # the array holds pairs of the database index and the ID number
+            self._dbidxs = ids[0::2]
+            self._doc_ids = ids[1::2]
+        else:
+            self._doc_ids = ids
+        self._hintsNative = hintsNative
+
+class _LRUCache(object):
+    # least recently used entries are evicted first, and entries expire after `ttl' seconds
+    
+    def __init__(self, capnum, ttl, capsize):
+        self._capnum = capnum
+        self._ttl = ttl
+        self._capsize = capsize
+        self._size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every invalidation, so that a value read before it is not stored after it
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] and entry[0] < time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, value, size=1, generation=None):
+        # `generation' is the value of `_generation' before `value' was read
+        if size > self._capsize:
+            return
+        expire = time.time() + self._ttl if self._ttl > 0 else 0
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._insert(key, (expire, value, size))
+            while len(self._entries) > self._capnum or self._size > self._capsize:
+                self._remove(next(iter(self._entries)))
+    
+    def clear(self):
+        """Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._generation += 1
+    
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._size += entry[2]
+    
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry[2]
+
+class ResultCache(_LRUCache):
+    """Cache of search results in front of the native index.
+    Results are keyed by `Condition.key' and evicted when they are least recently used or
+    expired.  The attributes `hits' and `misses' count lookups.  A cache object may be shared
+    by several database objects, a writer included, to be invalidated by its updates.  Keys
+    include the name of the database, so databases of different caskets can share it too.  A
+    result of a search running while the cache is invalidated is not cached.
+    """
+    
+    def __init__(self, capnum=1024, ttl=0, idnum=1 << 20):
+        """Create a cache.
+        `capnum' specifies the maximum number of cached results.
+        `ttl' specifies the lifetime of each result in seconds.  If it is not more than 0,
+        results do not expire.
+        `idnum' specifies the maximum total number of ID numbers in cached results, which bounds
+        the memory usage.
+        """
+        _LRUCache.__init__(self, capnum, ttl, idnum)
+
+class AttributeCache(_LRUCache):
+    """Cache of attribute values of documents in front of `Database.get_doc_attr'.
+    Values are keyed by pairs of the ID number and the attribute name, and evicted when they are
+    least recently used or expired.  The attributes `hits' and `misses' count lookups.  It is
+    sized independently of the native attribute cache set by `Database.set_cache_size'.
+    """
+    
+    def __init__(self, capnum=65536, ttl=0):
+        """Create a cache.
+        `capnum' specifies the maximum number of cached values.
+        `ttl' specifies the lifetime of each value in seconds.  If it is not more than 0, values
+        do not expire.
+        """
+        _LRUCache.__init__(self, capnum, ttl, capnum)
+        self._names = {}
+    
+    def clear(self):
+        """Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._names.clear()
+            self._size = 0
+            self._generation += 1
+    
+    def invalidate(self, id):
+        """Remove entries of a document.
+        `id' specifies the ID number of a document.
+        """
+        with self._lock:
+            for name in list(self._names.get(id, ())):
+                self._remove((id, name))
+            self._generation += 1
+    
+    def _insert(self, key, entry):
+        _LRUCache._insert(self, key, entry)
+        self._names.setdefault(key[0], set()).add(key[1])
+    
+    def _remove(self, key):
+        _LRUCache._remove(self, key)
+        names = self._names[key[0]]
+        names.discard(key[1])
+        if not names:
+            del self._names[key[0]]
+
+_MISSING = object()
+
+def _prefetch(iterable, depth):
+    # iterate in a background thread, keeping up to `depth' items ready
+    items = queue.Queue(depth)
+    stop = threading.Event()
+    end = object()
+    
+    def put(entry):
+        # give up once the consumer has stopped, so that the thread can always be joined
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+    
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+# data types of attribute indexes by their names in expressions
+_IDXATTR_NAMES = {"seq": ESTIDXATTRSEQ, "str": ESTIDXATTRSTR, "num": ESTIDXATTRNUM}
 
 class Database(object):
     DBREADER = ESTDBREADER         # open mode: open as a reader
@@ -365,16 +966,42 @@ class Database(object):
     GDNOTEXT = ESTGDNOTEXT         # get_doc option: no text
     GDNOKWD  = ESTGDNOKWD          # get_doc option: no keywords
     
+    IDXATTRSEQ = ESTIDXATTRSEQ     # attribute index type: for multipurpose sequencial access method
+    IDXATTRSTR = ESTIDXATTRSTR     # attribute index type: for narrowing with attributes as strings
+    IDXATTRNUM = ESTIDXATTRNUM     # attribute index type: for narrowing with attributes as numbers
+    
     _estdb = None
+    _rescache = None
+    _attrcache = None
+    _cache_size = 64 * 1024 * 1024 # the default maximum size of the index cache
     
-    def search_meta(self, dbs, cond):
+    def search_meta(self, dbs, cond, copy=True, hints=True):
         """Search plural databases for documents corresponding a condition.
         `dbs' specifies an array whose elements are database objects.
         `cond' specifies a condition object.
-        The return value is a result object.  On error, `nil' is returned.
+        `copy' specifies whether to copy the native result.  If it is false, the result object
+        shares the native array until it is collected.
+        `hints' specifies whether to collect hints.  If it is false, `Result.hint_words' returns
+        an empty array.
+        The return value is a result object.  On error, `None' is returned.
         """
-        # TODO
-        pass
+        if not dbs:
+            return None
+        dbsNative = (ctypes.c_void_p * len(dbs))(*[db._estdb for db in dbs])
+        num = ctypes.c_int()
+        condNative = cond.toNative()
+        hintsNative = None
+        if hints:
+            hintsNative = cbmapopenex(31) # MINIBNUM
+        idsNative = est_db_search_meta(dbsNative, len(dbs), condNative,
+                                       ctypes.byref(num), hintsNative)
+        cond.deleteNative(condNative)
+        
+        result = Result()
+        result.fromNative(idsNative, num.value // 2, hintsNative, meta=True, copy=copy)
+        if copy:
+            libc.free(idsNative)
+        return result
     
     def err_msg(self, ecode):
         """Get the string of an error code.
@@ -418,8 +1045,10 @@ class Database(object):
         The return value is true if success, else it is false.
         """
         ecode = ctypes.c_int()
-        if not self._estdb:
-            if not est_db_close(self._estdb, ctypes.byref(ecode)):
+        if self._estdb:
+            estdb = self._estdb
+            self._estdb = None
+            if not est_db_close(estdb, ctypes.byref(ecode)):
                 return False
         return True
     
@@ -435,6 +1064,13 @@ class Database(object):
         """
         return est_db_fatal(self._estdb)
     
+    def interrupt(self):
+        """Interrupt long time processing.
+        This method can be called from another thread while the database is searching.
+        """
+        if self._estdb:
+            est_db_interrupt(self._estdb)
+    
     def add_attr_index(self, name, type):
         """Add an index for narrowing or sorting with document attributes.
         `name' specifies the name of an attribute.
@@ -442,8 +1078,63 @@ class Database(object):
         sequencial access method, `Database.IDXATTRSTR' for narrowing with attributes as strings,
         `Database.IDXATTRNUM' for narrowing with attributes as numbers.
         The return value is true if success, else it is false.
+        Note that this method should be called before the first document is registered.
         """
-        pass
+        rv = est_db_add_attr_index(self._estdb, name.encode("utf-8"), type)
+        if rv:
+            return True
+        else:
+            return False
+    
+    def attr_index_exprs(self):
+        """Get expressions of attribute indexes.
+        The return value is an array of expressions of attribute indexes, each of which is the
+        name of an attribute and the data type, such as "price=num".
+        """
+        exprsNative = est_db_attr_index_exprs(self._estdb)
+        rv = [cblistval(exprsNative, i, None).decode("utf-8")
+              for i in range(cblistnum(exprsNative))]
+        cblistclose(exprsNative)
+        return rv
+    
+    def suggest_attr_indexes(self, conds):
+        """Suggest attribute indexes which would speed up a workload.
+        `conds' specifies an iterable of condition objects of the workload.
+        The return value is an array of tuples of the name of an attribute, the data type of an
+        attribute index as with `add_attr_index', and the number of conditions using it, in
+        descending order of the number.  Narrowing with string operators suggests
+        `Database.IDXATTRSTR', narrowing with number or date operators suggests
+        `Database.IDXATTRNUM', and ordering suggests `Database.IDXATTRSEQ'.  Indexes which the
+        database already has are excluded.
+        """
+        existing = set()
+        if self._estdb:
+            for expr in self.attr_index_exprs():
+                name, sep, type = expr.rpartition("=")
+                if sep and type in _IDXATTR_NAMES:
+                    existing.add((name, _IDXATTR_NAMES[type]))
+        counts = collections.Counter()
+        for cond in conds:
+            used = set()
+            for expr in cond._attr:
+                tokens = expr.split()
+                if len(tokens) < 2:
+                    continue
+                # strip the prefixes for negation and for case insensitivity
+                op = tokens[1].upper().lstrip("!")
+                if op.startswith("I") and op[1:].startswith("STR"):
+                    op = op[1:]
+                if op.startswith("STR"):
+                    used.add((tokens[0], Database.IDXATTRSTR))
+                elif op.startswith("NUM"):
+                    used.add((tokens[0], Database.IDXATTRNUM))
+            if cond._order:
+                tokens = cond._order.split()
+                if len(tokens) >= 1 and not tokens[0].startswith("["):
+                    used.add((tokens[0], Database.IDXATTRSEQ))
+            counts.update(used - existing)
+        return [(name, type, num) for (name, type), num in
+                sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
     
     def flush(self, max):
         """Flush index words in the cache.
@@ -475,6 +1166,7 @@ class Database(object):
         The return value is true if success, else it is false.
         """
         rv = est_db_optimize(self._estdb, options)
+        self._invalidate()
         if rv:
             return True
         else:
@@ -488,26 +1180,222 @@ class Database(object):
         The return value is true if success, else it is false.
         """
         rv = est_db_merge(self._estdb, name.encode("utf-8"), options)
+        self._invalidate()
         if rv:
             return True
         else:
             return False
     
-    def put_doc(self, doc, options):
+    def put_doc(self, doc, options, incremental=False, digests=None):
         """Add a document.
         `doc' specifies a document object.  The document object should have the URI attribute.
         `options' specifies options: `Database.PDCLEAN' to clean up dispensable regions of the
         overwritten document.
-        The return value is true if success, else it is false.
+        `incremental' specifies whether to skip the document if it is not changed.  The digest of
+        the document is compared with the one stored with the document of the same URI, and
+        stored as the attribute "@digest".
+        `digests' specifies a hash object mapping URIs to digests, such as a `shelve' object,
+        which is looked up and updated instead of the database.  If it is `None', the attribute
+        "@digest" in the database is looked up.
+        The return value is true if success, else it is false.  A skipped document is a success.
         """
+        if incremental:
+            status, oldid, id = self._put_draft(_to_draft(doc), options, digests)
+            if id:
+                doc._id = id
+            if status in ("added", "updated"):
+                self._invalidate(oldid)
+            return status != "failed"
+        id = None
+        if self._attrcache is not None and doc.attr("@uri"):
+            id = est_db_uri_to_id(self._estdb, doc.attr("@uri").encode("utf-8"))
         docNative = doc.toNative()
         rv = est_db_put_doc(self._estdb, docNative, options)
+        if rv:
+            doc._id = est_doc_id(docNative)
+            rv = self._put_doc_keywords(docNative)
         doc.deleteNative(docNative)
+        self._invalidate(id)
         if rv:
             return True
         else:
             return False
     
+    def _put_doc_keywords(self, docNative):
+        # store keywords attached to a registered document for keyword vectors
+        kwordsNative = est_doc_keywords(docNative)
+        if not kwordsNative:
+            return True
+        return bool(est_db_put_keywords(self._estdb, est_doc_id(docNative), kwordsNative, 1.0))
+    
+    def put_docs(self, docs, options, flush_every=0, incremental=False, digests=None,
+                 high_water=0):
+        """Add documents in bulk.
+        `docs' specifies an iterable of document objects or of their draft data as returned by
+        `Document.dump_draft', either as strings or as UTF-8 bytes.  Each document should have the
+        URI attribute.
+        `options' specifies options: `Database.PDCLEAN' to clean up dispensable regions of the
+        overwritten document.
+        `flush_every' specifies the number of documents after which index words in the cache are
+        flushed.  If it is not more than zero, the cache is left to the database.
+        `incremental' and `digests' specify how to skip unchanged documents as with `put_doc'.
+        `high_water' specifies the size of the used cache region above which index words are
+        flushed a part at a time, until the size goes down to three quarters of it.  If it is not
+        more than zero, it is not used.
+        The return value is an array of true or false for each document, in the same order.
+        """
+        if incremental:
+            return [status != "failed" for status, id in
+                    self._update_docs(docs, options, digests, flush_every, high_water)]
+        estdb = self._estdb
+        rv = []
+        for doc in docs:
+            docNative = est_doc_new_from_draft(_to_draft(doc))
+            rv.append(bool(est_db_put_doc(estdb, docNative, options)) and
+                      self._put_doc_keywords(docNative))
+            est_doc_delete(docNative)
+            if flush_every > 0 and len(rv) % flush_every == 0:
+                est_db_flush(estdb, 0)
+            elif high_water > 0:
+                self._flush_high_water(high_water)
+        self._invalidate()
+        return rv
+    
+    def _flush_high_water(self, high_water):
+        # flush index words in proportion to the excess until the used cache region goes down
+        # to the low water mark
+        estdb = self._estdb
+        used = est_db_used_cache_size(estdb)
+        if used <= high_water:
+            return
+        low_water = high_water * 3 // 4
+        while used > low_water:
+            num = est_db_cache_num(estdb)
+            if num <= 0:
+                break
+            est_db_flush(estdb, max(num * (used - low_water) // used, 1))
+            prev = used
+            used = est_db_used_cache_size(estdb)
+            if used >= prev:
+                break
+    
+    def update_docs(self, docs, options, digests=None, remove_missing=False, flush_every=0,
+                    high_water=0):
+        """Add changed documents in bulk and skip unchanged ones.
+        `docs' specifies an iterable of documents as with `put_docs'.
+        `options' specifies options as with `put_docs'.
+        `digests' specifies a hash object mapping URIs to digests as with `put_doc'.
+        `remove_missing' specifies whether to remove documents which are not in `docs'.  If
+        `digests' is specified, only documents of its URIs are removed, else every document in
+        the database which is not in `docs' is removed.  A document whose URI is in `docs' is
+        never removed, even if it could not be registered again.
+        `flush_every' and `high_water' specify when index words in the cache are flushed as with
+        `put_docs'.
+        The return value is a hash object of the numbers of "added", "updated", "skipped",
+        "removed" and "failed" documents.
+        """
+        summary = {"added": 0, "updated": 0, "skipped": 0, "removed": 0, "failed": 0}
+        uris = set()
+        ids = set()
+        for status, id in self._update_docs(docs, options, digests, flush_every, high_water,
+                                            uris, ids):
+            summary[status] += 1
+        if remove_missing:
+            estdb = self._estdb
+            if digests is not None:
+                for uri in [uri for uri in digests.keys() if uri not in uris]:
+                    id = est_db_uri_to_id(estdb, uri.encode("utf-8"))
+                    if id > 0:
+                        if not est_db_out_doc(estdb, id, 0):
+                            summary["failed"] += 1
+                            continue
+                        summary["removed"] += 1
+                    del digests[uri]
+            elif est_db_iter_init(estdb, None):
+                missing = []
+                while True:
+                    id = est_db_iter_next(estdb)
+                    if id <= 0:
+                        break
+                    if id not in ids:
+                        missing.append(id)
+                for id in missing:
+                    # a document whose URI was supplied is kept even if its put failed
+                    uri = _take_string(_est_db_get_doc_attr(estdb, id, b"@uri"))
+                    if uri is None or uri in uris:
+                        continue
+                    if est_db_out_doc(estdb, id, 0):
+                        summary["removed"] += 1
+                    else:
+                        summary["failed"] += 1
+            if summary["removed"]:
+                self._invalidate()
+        return summary
+    
+    def _update_docs(self, docs, options, digests, flush_every, high_water=0, uris=None,
+                     ids=None):
+        # yield pairs of the status and the ID number of each document, and add the URIs and
+        # the old and new ID numbers of the documents, whatever their status, to `uris' and `ids'
+        estdb = self._estdb
+        changed = False
+        try:
+            for i, doc in enumerate(docs):
+                draft = _to_draft(doc)
+                status, oldid, id = self._put_draft(draft, options, digests)
+                if uris is not None:
+                    for line in _split_draft(draft)[0]:
+                        if line.startswith(b"@uri="):
+                            uris.add(line[5:].decode("utf-8"))
+                    ids.update(num for num in (oldid, id) if num and num > 0)
+                if status in ("added", "updated"):
+                    changed = True
+                if flush_every > 0 and (i + 1) % flush_every == 0:
+                    est_db_flush(estdb, 0)
+                elif high_water > 0 and status in ("added", "updated"):
+                    self._flush_high_water(high_water)
+                yield status, id
+        finally:
+            if changed:
+                self._invalidate()
+    
+    def _put_draft(self, draft, options, digests):
+        # register draft data unless its digest is not changed
+        # the return value is a tuple of the status, the old ID number and the new ID number,
+        # either of which may be `None' if it is not known
+        estdb = self._estdb
+        header, body = _split_draft(draft)
+        digest = _draft_digest(header, body)
+        uri = None
+        for line in header:
+            if line.startswith(b"@uri="):
+                uri = line[5:]
+        if not uri:
+            return "failed", None, None
+        oldid = None
+        if digests is not None:
+            old = digests.get(uri.decode("utf-8"))
+            exists = old is not None
+            if self._attrcache is not None and exists:
+                oldid = est_db_uri_to_id(estdb, uri)
+        else:
+            oldid = est_db_uri_to_id(estdb, uri)
+            exists = oldid > 0
+            old = self.get_doc_attr(oldid, "@digest") if exists else None
+        if old == digest:
+            return "skipped", oldid, oldid
+        header = [b"@digest=" + digest.encode("ascii")] + \
+            [line for line in header if not line.startswith(_DIGEST_IGNORED)]
+        docNative = est_doc_new_from_draft(b"\n".join(header) + b"\n" + body)
+        ok = bool(est_db_put_doc(estdb, docNative, options)) and \
+            self._put_doc_keywords(docNative)
+        id = est_doc_id(docNative)
+        est_doc_delete(docNative)
+        if not ok:
+            return "failed", oldid, None
+        if digests is not None:
+            digests[uri.decode("utf-8")] = digest
+        return ("updated" if exists else "added"), oldid, id
+    
     def out_doc(self, id, options):
         """Remove a document.
         `id' specifies the ID number of a registered document.
@@ -516,6 +1404,7 @@ class Database(object):
         The return value is true if success, else it is false.
         """
         rv = est_db_out_doc(self._estdb, id, options)
+        self._invalidate(id)
         if rv:
             return True
         else:
@@ -523,40 +1412,294 @@ class Database(object):
     
     def edit_doc(self, doc):
         """Edit attributes of a document.
-        `doc' specifies a document object.
-        The return value is true if success, else it is false.
+        `doc' specifies a document object.  It should have the ID number and the URI of a
+        registered document, as one retrieved with `get_doc' does.  Neither of them can be
+        changed.
+        The return value is true if success, else it is false.  The body text is not indexed
+        again.
+        """
+        docNative = doc.toNative()
+        est_doc_set_id(docNative, doc.id())
+        rv = est_db_edit_doc(self._estdb, docNative)
+        doc.deleteNative(docNative)
+        self._invalidate(doc.id())
+        if rv:
+            return True
+        else:
+            return False
+    
+    def edit_attrs(self, updates):
+        """Edit attributes of documents in bulk.
+        `updates' specifies a hash object or an iterable of pairs.  Each key is the ID number or
+        the URI of a registered document and each value is a hash object of names and values of
+        attributes to be set.  If a value is `None', the attribute is removed.  "@id" and "@uri"
+        cannot be changed, and a document with either of them in its update is not edited.
+        The return value is an array of true or false for each document, in the same order.
+        Each document is retrieved without the body text and keywords and edited with its native
+        object, so the full-text index is not touched.
         """
-        pass
+        if isinstance(updates, dict):
+            updates = updates.items()
+        estdb = self._estdb
+        options = Database.GDNOTEXT | Database.GDNOKWD
+        rv = []
+        for key, attrs in updates:
+            if "@id" in attrs or "@uri" in attrs:
+                rv.append(False)
+                continue
+            if isinstance(key, str):
+                id = est_db_uri_to_id(estdb, key.encode("utf-8"))
+            else:
+                id = key
+            docNative = est_db_get_doc(estdb, id, options) if id > 0 else None
+            if not docNative:
+                rv.append(False)
+                continue
+            for name in attrs:
+                value = attrs[name]
+                est_doc_add_attr(docNative, name.encode("utf-8"),
+                                 ("%s" % value).encode("utf-8") if value is not None else None)
+            rv.append(bool(est_db_edit_doc(estdb, docNative)))
+            est_doc_delete(docNative)
+            if self._attrcache is not None:
+                self._attrcache.invalidate(id)
+        if self._rescache is not None:
+            self._rescache.clear()
+        return rv
     
-    def get_doc(self, id, options):
+    def get_doc(self, id, options, native=False):
         """Retrieve a document.
         `id' specifies the ID number of a registered document.
         `options' specifies options: `Database.GDNOATTR' to ignore attributes, `Database.GDNOTEXT'
         to ignore the body text, `Database.GDNOKWD' to ignore keywords.  The three can be
         specified at the same time by bitwise or.
+        `native' specifies whether to return a `NativeDocument' object, which keeps the native
+        document and reads its attributes and texts on access, instead of copying everything.
         The return value is a document object.  On error, `None' is returned.
         """
         doc = Document()
         docNative = est_db_get_doc(self._estdb, id, options)
-        if docNative:
+        if docNative and native:
+            doc = NativeDocument(docNative)
+        elif docNative:
             doc.fromNative(docNative)
             doc.deleteNative(docNative)
         else:
             doc = None
         return doc
     
+    def get_docs(self, ids, attrs=None, texts=False):
+        """Retrieve documents in bulk.
+        `ids' specifies an array of ID numbers of registered documents.
+        `attrs' specifies an array of names of attributes to be retrieved.  If it is `None',
+        document objects are returned instead of tuples.
+        `texts' specifies whether to retrieve the body text.  Keywords are never retrieved.
+        The return value is an array in the same order as `ids'.  If `attrs' is specified, each
+        element is a tuple of the ID number and the values of the attributes, followed by an
+        array of sentences of the text if `texts' is true.  Values of missing attributes are
+        `None'.  Elements of missing documents are `None'.
+        """
+        options = Database.GDNOKWD
+        if not texts:
+            options |= Database.GDNOTEXT
+        if attrs is None:
+            return [self.get_doc(id, options) for id in ids]
+        estdb = self._estdb
+        names = [name.encode("utf-8") for name in attrs]
+        rv = []
+        for id in ids:
+            docNative = est_db_get_doc(estdb, id, options)
+            if not docNative:
+                rv.append(None)
+                continue
+            row = [id]
+            for name in names:
+                value = est_doc_attr(docNative, name)
+                row.append(value.decode("utf-8") if value is not None else None)
+            if texts:
+                textsNative = est_doc_texts(docNative)
+                row.append([cblistval(textsNative, i, None).decode("utf-8")
+                            for i in range(cblistnum(textsNative))])
+            est_doc_delete(docNative)
+            rv.append(tuple(row))
+        return rv
+    
+    def iter_docs(self, start_uri=None, options=0, chunk=100, prefetch=True):
+        """Iterate over all documents in the database.
+        `start_uri' specifies the URI of the document after which the iteration starts, which is
+        usually the URI of the last document seen by an interrupted iteration.  If it is `None',
+        the iteration starts from the beginning.
+        `options' specifies options as with `Database.get_doc'.
+        `chunk' specifies the number of documents retrieved at once.
+        `prefetch' specifies whether to retrieve the next chunk in a background thread while the
+        current one is consumed.  The database object should not be used otherwise until the
+        iteration ends.
+        Each value is a pair of the ID number and a document object.  Only one chunk or two are
+        kept in memory at a time.
+        """
+        prev = start_uri.encode("utf-8") if start_uri is not None else None
+        if not est_db_iter_init(self._estdb, prev):
+            return
+        chunks = self._iter_chunks(options, max(chunk, 1))
+        if prefetch:
+            chunks = _prefetch(chunks, 1)
+        for docs in chunks:
+            for doc in docs:
+                yield doc.id(), doc
+    
+    def _iter_chunks(self, options, chunk):
+        estdb = self._estdb
+        while True:
+            docs = []
+            id = 0
+            while len(docs) < chunk:
+                id = est_db_iter_next(estdb)
+                if id <= 0:
+                    break
+                doc = self.get_doc(id, options)
+                if doc:
+                    docs.append(doc)
+            if docs:
+                yield docs
+            if id <= 0:
+                return
+    
+    def make_snippets(self, ids, words, wwidth, hwidth, awidth, texts=None):
+        """Make snippets of the body text of documents in bulk.
+        `ids' specifies an array of ID numbers of registered documents.
+        `words' specifies a result object or an array object of words to be highlight.  If it is
+        a result object, words are extracted from its hints as the search engine does.
+        `wwidth' specifies whole width of each result.
+        `hwidth' specifies width of strings picked up from the beginning of the text.
+        `awidth' width of strings picked up around each highlighted word.
+        `texts' specifies a hash object mapping ID numbers to cached body texts.  Documents in it
+        are not retrieved from the database.  If it is `None', it is not used.
+        The return value is an array of snippet strings in the same order as `ids', in the same
+        format as with `Document.make_snippet'.  Elements of missing documents are `None'.
+        The list of words is made only once for all documents, and each document is retrieved
+        without attributes and keywords.
+        """
+        estdb = self._estdb
+        options = Database.GDNOATTR | Database.GDNOKWD
+        wordsNative = _words_to_cblist(words)
+        rv = []
+        try:
+            for id in ids:
+                if texts is not None and id in texts:
+                    rv.append(_take_string(_est_str_make_snippet(
+                        texts[id].encode("utf-8"), wordsNative, wwidth, hwidth, awidth)))
+                    continue
+                docNative = est_db_get_doc(estdb, id, options)
+                if not docNative:
+                    rv.append(None)
+                    continue
+                rv.append(_take_string(_est_doc_make_snippet(docNative, wordsNative,
+                                                             wwidth, hwidth, awidth)))
+                est_doc_delete(docNative)
+        finally:
+            cblistclose(wordsNative)
+        return rv
+    
     def get_doc_attr(self, id, name):
         """Retrieve the value of an attribute of a document.
         `id' specifies the ID number of a registered document.
         `name' specifies the name of an attribute.
         The return value is the value of the attribute or `None' if it does not exist.
         """
-        attrNative = est_db_get_doc_attr(self._estdb, id, name.encode("utf-8"))
-        attr = None
-        if attrNative:
-            attr = attrNative.decode("utf-8")
-            libc.free(attrNative)
-        return attr
+        cache = self._attrcache
+        if cache is not None:
+            attr = cache.get((id, name), _MISSING)
+            if attr is _MISSING:
+                generation = cache._generation
+                attr = _take_string(_est_db_get_doc_attr(self._estdb, id, name.encode("utf-8")))
+                cache.put((id, name), attr, 1, generation)
+            return attr
+        return _take_string(_est_db_get_doc_attr(self._estdb, id, name.encode("utf-8")))
+    
+    def prefetch_attrs(self, ids, names):
+        """Load values of attributes of documents into the attribute cache.
+        `ids' specifies an array of ID numbers of registered documents.
+        `names' specifies an array of names of attributes.
+        Each document is retrieved at most once.  Nothing is done if the attribute cache is not
+        set.
+        """
+        cache = self._attrcache
+        if cache is None:
+            return
+        with cache._lock:
+            ids = [id for id in ids
+                   if any((id, name) not in cache._entries for name in names)]
+            generation = cache._generation
+        for row in self.get_docs(ids, names):
+            if row is None:
+                continue
+            for name, value in zip(names, row[1:]):
+                cache.put((row[0], name), value, 1, generation)
+    
+    def etch_docs(self, docs, max, store=False):
+        """Extract keywords of documents.
+        `docs' specifies an array of document objects or of ID numbers of registered documents.
+        `max' specifies the maximum number of keywords extracted from each document.
+        `store' specifies whether to store keywords of registered documents, given by ID number,
+        with `Database.put_keywords'.
+        The return value is an array of hash objects of keywords and their scores in decimal
+        string, in the same order as `docs'.  Elements of missing documents are `None'.  The
+        keywords are also attached to document objects, so that `Database.put_doc' stores them
+        without extracting them again.
+        """
+        estdb = self._estdb
+        rv = []
+        for doc in docs:
+            if isinstance(doc, Document):
+                docNative = doc.toNative()
+            else:
+                docNative = est_db_get_doc(estdb, doc, Database.GDNOATTR | Database.GDNOKWD)
+                if not docNative:
+                    rv.append(None)
+                    continue
+            kwordsNative = est_db_etch_doc(estdb, docNative, max)
+            est_doc_delete(docNative)
+            kwords = _cbmap_to_dict(kwordsNative)
+            if isinstance(doc, Document):
+                doc.set_keywords(kwords)
+            elif store:
+                est_db_put_keywords(estdb, doc, kwordsNative, 1.0)
+            cbmapclose(kwordsNative)
+            rv.append(kwords)
+        return rv
+    
+    def put_keywords(self, id, kwords, weight=1.0):
+        """Store keywords of a document.
+        `id' specifies the ID number of a registered document.
+        `kwords' specifies a hash object of keywords and their scores in decimal string.
+        `weight' specifies weighting bias of scores.
+        The return value is true if success, else it is false.
+        """
+        kwordsNative = _dict_to_cbmap(kwords)
+        rv = est_db_put_keywords(self._estdb, id, kwordsNative, weight)
+        cbmapclose(kwordsNative)
+        if rv:
+            return True
+        else:
+            return False
+    
+    def get_keywords(self, ids):
+        """Retrieve stored keywords of documents.
+        `ids' specifies an array of ID numbers of registered documents.
+        The return value is an array of hash objects of keywords and their scores in decimal
+        string, in the same order as `ids'.  Elements of documents without stored keywords are
+        `None'.
+        """
+        estdb = self._estdb
+        rv = []
+        for id in ids:
+            kwordsNative = est_db_get_keywords(estdb, id)
+            if kwordsNative:
+                rv.append(_cbmap_to_dict(kwordsNative))
+                cbmapclose(kwordsNative)
+            else:
+                rv.append(None)
+        return rv
     
     def uri_to_id(self, uri):
         """Get the ID of a document specified by URI.
@@ -589,28 +1732,301 @@ class Database(object):
         """
         return est_db_size(self._estdb)
     
-    def search(self, cond):
+    def keyword_num(self):
+        """Get the number of unique keywords.
+        The return value is the number of unique keywords in the database.
+        """
+        return est_db_keyword_num(self._estdb)
+    
+    def iter_words(self):
+        """Iterate over words in the inverted index.
+        Each value is a word.  Words still in the cache, which is flushed by `Database.flush', are
+        not included.
+        """
+        if not est_db_word_iter_init(self._estdb):
+            return
+        while True:
+            word = _take_string(_est_db_word_iter_next(self._estdb))
+            if word is None:
+                return
+            yield word
+    
+    def word_rec_size(self, word):
+        """Get the size of the record of a word.
+        `word' specifies a word.
+        The return value is the size of the record of the word.  If there is no corresponding
+        record, 0 is returned.
+        """
+        return est_db_word_rec_size(self._estdb, word.encode("utf-8"))
+    
+    def iter_keywords(self):
+        """Iterate over keywords stored for keyword vectors.
+        Each value is a keyword.
+        """
+        if not est_db_keyword_iter_init(self._estdb):
+            return
+        while True:
+            word = _take_string(_est_db_keyword_iter_next(self._estdb))
+            if word is None:
+                return
+            yield word
+    
+    def keyword_rec_size(self, word):
+        """Get the size of the record of a keyword.
+        `word' specifies a keyword.
+        The return value is the size of the record of the keyword.  If there is no corresponding
+        record, 0 is returned.
+        """
+        return est_db_keyword_rec_size(self._estdb, word.encode("utf-8"))
+    
+    def index_profile(self, top=20, keywords=False):
+        """Profile the distribution of record sizes of the index.
+        `top' specifies the number of the heaviest records to be reported.
+        `keywords' specifies whether to profile keywords instead of words.
+        The return value is a hash object: `count' is the number of records, `total' is the total
+        size, `top' is an array of pairs of a word and its size in descending order of size, and
+        `histogram' maps each power of 2 to the number of records whose size is up to it and
+        more than its half.  Memory usage does not depend on the size of the index.
+        """
+        if keywords:
+            words = self.iter_keywords()
+            rec_size = est_db_keyword_rec_size
+        else:
+            words = self.iter_words()
+            rec_size = est_db_word_rec_size
+        estdb = self._estdb
+        heaviest = []
+        histogram = {}
+        count = 0
+        total = 0
+        for word in words:
+            size = rec_size(estdb, word.encode("utf-8"))
+            count += 1
+            total += size
+            bucket = 1
+            while bucket < size:
+                bucket <<= 1
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+            if len(heaviest) < top:
+                heapq.heappush(heaviest, (size, word))
+            elif top > 0 and size > heaviest[0][0]:
+                heapq.heapreplace(heaviest, (size, word))
+        return {
+            "count": count,
+            "total": total,
+            "top": [(word, size) for size, word in sorted(heaviest, reverse=True)],
+            "histogram": histogram,
+        }
+    
+    def search_similar(self, doc, max=10, candidates=1000, seednum=32):
+        """Search for documents similar to a document by their keyword vectors.
+        `doc' specifies the ID number of a registered document or a document object.  If the
+        document has no keywords attached or stored, they are extracted.
+        `max' specifies the maximum number of documents in the result.
+        `candidates' specifies the maximum number of candidates gathered from keyword search.
+        `seednum' specifies the maximum number of keywords extracted for the seed vector.
+        The return value is a result object in descending order of similarity.  The seed
+        document itself is excluded.  Candidates without stored keywords are ignored.  NumPy is
+        used to score candidates in batches if it is available.
+        """
+        estdb = self._estdb
+        seedid = -1
+        if isinstance(doc, Document):
+            seedid = doc.id()
+            if doc.keywords():
+                svmap = _dict_to_cbmap(doc.keywords())
+            else:
+                docNative = doc.toNative()
+                svmap = est_db_etch_doc(estdb, docNative, seednum)
+                doc.deleteNative(docNative)
+        else:
+            seedid = doc
+            svmap = est_db_get_keywords(estdb, seedid)
+            if not svmap:
+                docNative = est_db_get_doc(estdb, seedid, Database.GDNOATTR | Database.GDNOKWD)
+                if not docNative:
+                    return None
+                svmap = est_db_etch_doc(estdb, docNative, seednum)
+                est_doc_delete(docNative)
+        try:
+            return self._search_similar(svmap, seedid, max, candidates)
+        finally:
+            cbmapclose(svmap)
+    
+    def _search_similar(self, svmap, seedid, max, candidates):
+        estdb = self._estdb
+        vnum = cbmaprnum(svmap)
+        svec = (ctypes.c_int * vnum)()
+        est_vector_set_seed(svmap, svec, vnum)
+        # gather candidates from documents sharing keywords with the seed
+        ids = []
+        seen = set([seedid])
+        num = ctypes.c_int()
+        keylistNative = cbmapkeys(svmap)
+        for i in range(cblistnum(keylistNative)):
+            idsNative = est_db_keyword_search(estdb, cblistval(keylistNative, i, None),
+                                              ctypes.byref(num))
+            for j in range(num.value):
+                if len(ids) >= candidates:
+                    break
+                if idsNative[j] not in seen:
+                    seen.add(idsNative[j])
+                    ids.append(idsNative[j])
+            libc.free(idsNative)
+            if len(ids) >= candidates:
+                break
+        cblistclose(keylistNative)
+        # score candidates by the cosine of their keyword vectors
+        numpy = _numpy()
+        scored = []
+        batch = 256
+        for start in range(0, len(ids), batch):
+            targets = []
+            for id in ids[start:start + batch]:
+                tvmap = est_db_get_keywords(estdb, id)
+                if not tvmap:
+                    continue
+                tvec = (ctypes.c_int * vnum)()
+                est_vector_set_target(svmap, tvmap, tvec, vnum)
+                cbmapclose(tvmap)
+                targets.append((id, tvec))
+            if not targets:
+                continue
+            if numpy is not None and vnum > 0:
+                seed = numpy.frombuffer(svec, dtype=numpy.intc).astype(numpy.float64)
+                matrix = numpy.array([numpy.frombuffer(tvec, dtype=numpy.intc)
+                                      for id, tvec in targets], dtype=numpy.float64)
+                norms = numpy.sqrt((matrix * matrix).sum(axis=1)) * numpy.sqrt(seed.dot(seed))
+                dots = matrix.dot(seed)
+                scores = numpy.where(norms > 0, dots / numpy.where(norms > 0, norms, 1), 0.0)
+                scored.extend(zip(scores.tolist(), [id for id, tvec in targets]))
+            else:
+                for id, tvec in targets:
+                    scored.append((est_vector_cosine(svec, tvec, vnum), id))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        result = Result()
+        result._doc_ids = [id for score, id in scored[:max]]
+        result._hints = {"": len(scored)}
+        return result
+    
+    def break_texts(self, texts, norm=True, tail=False, counter=None):
+        """Break texts into words with the analyzer of the database.
+        `texts' specifies an iterable of texts.
+        `norm' specifies whether to normalize the texts.
+        `tail' specifies whether to pick up oddness N-gram at the end.
+        `counter' specifies a `collections.Counter' object updated with the number of each word.
+        If it is `None', it is not used.
+        The return value is a tokens object.  The perfect N-gram analyzer or the character
+        category analyzer is used if the database was created with `Database.DBPERFNG' or
+        `Database.DBCHRCAT'.  If the database is not opened, the default N-gram analyzer is used.
+        """
+        analyzer = est_break_text
+        # the character category analyzer takes no argument for oddness N-gram
+        chrcat = False
+        if self._estdb:
+            if est_db_check_option(self._estdb, Database.DBPERFNG) > 0:
+                analyzer = est_break_text_perfng
+            elif est_db_check_option(self._estdb, Database.DBCHRCAT) > 0:
+                analyzer = est_break_text_chrcat
+                chrcat = True
+        tokens = Tokens()
+        chunks = []
+        offsets = tokens.offsets
+        text_offsets = tokens.text_offsets
+        base = 0
+        size = ctypes.c_int()
+        for text in texts:
+            listNative = cblistopen()
+            if chrcat:
+                analyzer(text.encode("utf-8"), listNative, int(bool(norm)))
+            else:
+                analyzer(text.encode("utf-8"), listNative, int(bool(norm)), int(bool(tail)))
+            num = cblistnum(listNative)
+            dumpNative = _cblistdump(listNative, ctypes.byref(size))
+            dump = ctypes.string_at(dumpNative, size.value)
+            libc.free(dumpNative)
+            spans = _parse_listdump(dump, num)
+            if spans is None:
+                words = [cblistval(listNative, i, None) for i in range(num)]
+            else:
+                words = [dump[start:end] for start, end in spans]
+            cblistclose(listNative)
+            for word in words:
+                chunks.append(word)
+                base += len(word)
+                offsets.append(base)
+            text_offsets.append(len(offsets) - 1)
+        tokens.buffer = b"".join(chunks)
+        if counter is not None:
+            for word, num in collections.Counter(chunks).items():
+                counter[word.decode("utf-8")] += num
+        return tokens
+    
+    def set_result_cache(self, cache):
+        """Set the cache of search results.
+        `cache' specifies a result cache object.  If it is `None', results are not cached.
+        The cache is cleared whenever this database object updates the database.
+        """
+        self._rescache = cache
+    
+    def set_attr_cache(self, cache):
+        """Set the cache of attribute values of documents.
+        `cache' specifies an attribute cache object.  If it is `None', values are not cached.
+        Values of a document are removed from the cache whenever this database object updates
+        the document.
+        """
+        self._attrcache = cache
+    
+    def _invalidate(self, id=None):
+        # `id' specifies the only updated document if known
+        if self._rescache is not None:
+            self._rescache.clear()
+        if self._attrcache is not None:
+            if id is None:
+                self._attrcache.clear()
+            elif id > 0:
+                self._attrcache.invalidate(id)
+    
+    def search(self, cond, copy=True, hints=True, cache=True):
         """Search for documents corresponding a condition.
         `cond' specifies a condition object.
-        The return value is a result object.  On error, `None' is returned.
+        `copy' specifies whether to copy the native result.  If it is false, the result object
+        shares the native array until it is collected, and `Result.get_doc_ids' and
+        `Result.to_numpy' return views without copying.
+        `hints' specifies whether to collect hints.  If it is false, no hint map is passed to the
+        native search and `Result.hint_words' returns an empty array.  Otherwise hints are
+        decoded on the first call of `Result.hint' or `Result.hint_words'.
+        `cache' specifies whether to use the result cache set with `set_result_cache'.  If it is
+        false, the native index is always searched and the result is not cached.
+        The return value is a result object.  On error, `None' is returned.  If the result cache
+        is set, a cached result object may be returned; it should not be modified.
         """
+        cache = self._rescache if cache else None
+        if cache is not None:
+            key = (self.name(), cond.key(), bool(hints))
+            result = cache.get(key)
+            if result is None:
+                generation = cache._generation
+                result = self._search(cond, copy, hints)
+                result._load_hints()
+                cache.put(key, result, max(result.doc_num(), 1), generation)
+            return result
+        return self._search(cond, copy, hints)
+    
+    def _search(self, cond, copy, hints):
         num = ctypes.c_int()
         condNative = cond.toNative()
-        hintsNative = cbmapopenex(31) # MINIBNUM
+        hintsNative = None
+        if hints:
+            hintsNative = cbmapopenex(31) # MINIBNUM
         idsNative = est_db_search(self._estdb, condNative,
                                   ctypes.byref(num), hintsNative)
         cond.deleteNative(condNative)
         
         result = Result()
-        result._doc_ids = [idsNative[i] for i in range(num.value)]
-        libc.free(idsNative)
-        keylistNative = cbmapkeys(hintsNative)
-        for i in range(cblistnum(keylistNative)):
-            keyNative = cblistval(keylistNative, i, None)
-            valueNative = cbmapget(hintsNative, keyNative, -1, None)
-            result._hints[keyNative.decode("utf-8")] = valueNative.decode("utf-8")
-        cblistclose(keylistNative)
-        cbmapclose(hintsNative)
+        result.fromNative(idsNative, num.value, hintsNative, copy=copy)
+        if copy:
+            libc.free(idsNative)
         return result
     
     def scan_doc(self, doc, cond):
@@ -620,12 +2036,15 @@ class Database(object):
         The return value is True if the document matches the phrase of the condition object
         definitely, else it is False.
         """
-        docNative = doc.toNative()
         condNative = cond.toNative()
-        rv = est_db_scan_doc(self._estdb, docNative, condNative)
-        condNative.deleteNative()
-        docNative.deleteNative()
-        return rv
+        if isinstance(doc, NativeDocument):
+            rv = est_db_scan_doc(self._estdb, doc._docNative, condNative)
+        else:
+            docNative = doc.toNative()
+            rv = est_db_scan_doc(self._estdb, docNative, condNative)
+            doc.deleteNative(docNative)
+        cond.deleteNative(condNative)
+        return bool(rv)
     
     def set_cache_size(self, size, anum, tnum, rnum):
         """Set the maximum size of the cache memory.
@@ -639,6 +2058,128 @@ class Database(object):
         it is 256.  If it is not more than 0, the current size is not changed.
         """
         est_db_set_cache_size(self._estdb, size, anum, tnum, rnum)
+        if size > 0:
+            self._cache_size = size
+    
+    def cache_size(self):
+        """Get the maximum size of the index cache.
+        The return value is the size last set with `set_cache_size', or the default 64MB.
+        """
+        return self._cache_size
+    
+    def cache_num(self):
+        """Get the number of records in the cache memory.
+        The return value is the number of index words in the cache.
+        """
+        return est_db_cache_num(self._estdb)
+    
+    def used_cache_size(self):
+        """Get the size of the used cache region.
+        The return value is the size of the used cache region in bytes.
+        """
+        return est_db_used_cache_size(self._estdb)
+    
+    def memory_usage(self):
+        """Get the load ratio of the physical memory.
+        The return value is the load ratio of the physical memory.  As for now, it is 0.0 on
+        platforms except for Windows.
+        """
+        return est_memory_usage()
+    
+    def set_special_cache(self, name, num):
+        """Set the special cache for narrowing and sorting with document attributes.
+        `name' specifies the name of an attribute.
+        `num' specifies the maximum number of cached records.
+        """
+        est_db_set_special_cache(self._estdb, name.encode("utf-8"), num)
+    
+    def fill_key_cache(self):
+        """Fill the cache for keys for TF-IDF.
+        """
+        est_db_fill_key_cache(self._estdb)
+    
+    def charge_rescc(self, max):
+        """Charge the result cache.
+        `max' specifies the maximum number of words to be charged.  If it not more than zero, all
+        words are charged.
+        """
+        est_db_charge_rescc(self._estdb, max)
+    
+    def refresh_rescc(self):
+        """Clear the result cache.
+        """
+        est_db_refresh_rescc(self._estdb)
+    
+    def list_rescc(self):
+        """Get words in the result cache.
+        The return value is an array of words in the result cache.
+        """
+        wordsNative = est_db_list_rescc(self._estdb)
+        rv = [cblistval(wordsNative, i, None).decode("utf-8")
+              for i in range(cblistnum(wordsNative))]
+        cblistclose(wordsNative)
+        return rv
+    
+    def warm_up(self, queries=None, special=None, special_num=65536, fill_keys=True,
+                charge=None, max_queries=0):
+        """Load caches before serving queries.
+        `queries' specifies the path of a query log file or an iterable of search phrases or of
+        condition objects, which are searched in order.  Each line of a query log file is a
+        search phrase, and empty lines and lines beginning with "#" are ignored.  If it is `None',
+        no query is replayed.
+        `special' specifies the name of an attribute for the special cache, which should be the
+        hottest attribute for narrowing and sorting.  If it is `None', the special cache is not
+        set.
+        `special_num' specifies the maximum number of records of the special cache.
+        `fill_keys' specifies whether to fill the cache for keys for TF-IDF.
+        `charge' specifies the maximum number of words charged to the result cache, as with
+        `charge_rescc'.  If it is `None', the result cache is not charged.
+        `max_queries' specifies the maximum number of replayed queries.  If it is not more than
+        zero, every query is replayed.
+        The return value is a hash object of what was loaded and the elapsed seconds.
+        """
+        report = {"special": special}
+        if special is not None:
+            self.set_special_cache(special, special_num)
+        if fill_keys:
+            start = time.time()
+            self.fill_key_cache()
+            report["key_cache_sec"] = time.time() - start
+        if charge is not None:
+            start = time.time()
+            self.charge_rescc(charge)
+            report["charge_sec"] = time.time() - start
+        replayed = 0
+        hits = 0
+        if queries is not None:
+            start = time.time()
+            log = None
+            if isinstance(queries, str):
+                log = open(queries, encoding="utf-8")
+                queries = (line.strip() for line in log)
+                queries = (line for line in queries if line and not line.startswith("#"))
+            try:
+                for query in queries:
+                    if 0 < max_queries <= replayed:
+                        break
+                    if isinstance(query, Condition):
+                        cond = query
+                    else:
+                        cond = Condition()
+                        cond.set_phrase(query)
+                    result = self.search(cond, hints=False)
+                    replayed += 1
+                    hits += result.doc_num()
+            finally:
+                if log is not None:
+                    log.close()
+            report["replay_sec"] = time.time() - start
+        report["queries"] = replayed
+        report["hits"] = hits
+        report["rescc_words"] = len(self.list_rescc())
+        if self._rescache is not None:
+            report["result_cache"] = len(self._rescache)
+        return report
     
     def add_pseudo_index(self, path):
         """Add a pseudo index directory.
@@ -662,3 +2203,105 @@ class Database(object):
         should have one parameter for a string of a message of each event.
         """
         est_db_set_informer(self._estdb, informer, None)
+
+class DatabasePool(object):
+    """Pool of database objects connected to the same database directory.
+    Each thread checks out its own database object, so that native calls, which release the
+    GIL, run in parallel without sharing a handle.
+    """
+    _name = None
+    _omode = 0
+    _size = 0
+    _idle = None
+    _generation = 0
+    _closed = True
+    
+    def open(self, name, omode, size):
+        """Open a pool of databases.
+        `name' specifies the name of a database directory.
+        `omode' specifies open modes as with `Database.open'.  It is usually `Database.DBREADER'.
+        `size' specifies the number of database objects in the pool.
+        The return value is true if success, else it is false.
+        """
+        self._name = name
+        self._omode = omode
+        self._size = size
+        self._idle = queue.LifoQueue()
+        self._generation = 0
+        self._closed = False
+        for i in range(size):
+            db = Database()
+            if not db.open(name, omode):
+                self.close()
+                return False
+            self._idle.put((db, self._generation))
+        return True
+    
+    def close(self):
+        """Close the pool.
+        Idle database objects are closed at once, and ones checked out are closed when they are
+        checked in.
+        The return value is true if success, else it is false.
+        """
+        self._closed = True
+        rv = True
+        while True:
+            try:
+                db, generation = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if db and not db.close():
+                rv = False
+        return rv
+    
+    def size(self):
+        """Get the size.
+        The return value is the number of database objects in the pool.
+        """
+        return self._size
+    
+    def refresh(self):
+        """Reopen every database object to see updates synchronized by a writer.
+        Idle database objects are reopened when they are checked out next, and ones checked out
+        are reopened when they are checked in.
+        """
+        self._generation += 1
+    
+    @contextlib.contextmanager
+    def checkout(self, timeout=None):
+        """Check out a database object for exclusive use in a `with' statement.
+        `timeout' specifies the number of seconds to wait for an idle database object.  If it is
+        `None', it waits forever.
+        The value of the `with' statement is a database object.  It is health-checked with
+        `Database.fatal' when it is checked in, and reopened if it has a fatal error or if the
+        pool was refreshed.  `queue.Empty' is raised on timeout and `IOError' is raised if a
+        database object cannot be reopened.
+        """
+        if self._closed:
+            raise IOError("the pool is closed")
+        db, generation = self._idle.get(timeout=timeout)
+        if not db or generation != self._generation:
+            db, generation = self._reopen(db)
+        try:
+            yield db
+        finally:
+            if db and (db.fatal() or generation != self._generation):
+                db, generation = self._reopen(db, strict=False)
+            if self._closed:
+                if db:
+                    db.close()
+            else:
+                self._idle.put((db, generation))
+    
+    def _reopen(self, db, strict=True):
+        # a slot without a database object is kept, to be retried on the next checkout
+        generation = self._generation
+        if db:
+            db.close()
+        db = Database()
+        if not db.open(self._name, self._omode):
+            if strict:
+                self._idle.put((None, generation))
+                raise IOError("cannot open the database: %s" % self._name)
+            return None, generation
+        return db, generation
@@ -0,0 +1,206 @@
+# Lazy loading of native libraries
+#
+# Libraries are loaded on the first call of any of their functions, and each function is
+# resolved and given its prototype on its own first call, so that importing the raw modules
+# costs almost nothing.  The library paths can be set with the environment variables
+# `ESTRAIER_LIBRARY' and `ESTRAIER_LIBC', or with `init'.  If the environment variable
+# `ESTRAIER_EAGER' is set to a non-empty value other than "0", every function is resolved as
+# soon as it is declared, as ctypes does by default.
+#
+# Modules binding functions register their namespaces with `LazyLibrary.rebind', and a resolved
+# function replaces its proxy there, so that calls after the first one go to ctypes directly.
+
+import ctypes
+import os
+
+_PROTOTYPE = ("restype", "argtypes", "errcheck")
+
+class LazyFunction(object):
+    """Function of a native library which is resolved on the first call.
+    The attributes `restype', `argtypes' and `errcheck' are recorded and applied when the
+    function is resolved.
+    """
+
+    def __init__(self, library, name, shared):
+        object.__setattr__(self, "_library", library)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_shared", shared)
+        object.__setattr__(self, "_prototype", {})
+        object.__setattr__(self, "_func", None)
+        if library.eager:
+            self.resolve()
+
+    def resolve(self):
+        """Resolve the symbol and apply the prototype.
+        The return value is the ctypes function object.
+        """
+        func = self._func
+        if func is None:
+            dll = self._library.load()
+            # a shared function is cached by the library object as with `CDLL.__getattr__'
+            func = getattr(dll, self._name) if self._shared else dll[self._name]
+            for key, value in self._prototype.items():
+                setattr(func, key, value)
+            if "__doc__" in self.__dict__:
+                func.__doc__ = self.__dict__["__doc__"]
+            object.__setattr__(self, "_func", func)
+            self._library._replace(self)
+        return func
+
+    def __call__(self, *args):
+        func = self._func
+        if func is None:
+            func = self.resolve()
+        return func(*args)
+
+    def __setattr__(self, key, value):
+        if key in _PROTOTYPE:
+            self._prototype[key] = value
+            if self._func is not None:
+                setattr(self._func, key, value)
+        else:
+            object.__setattr__(self, key, value)
+
+    def __getattr__(self, key):
+        if key.startswith("__"):
+            raise AttributeError(key)
+        if key in self._prototype:
+            return self._prototype[key]
+        return getattr(self.resolve(), key)
+
+    def __repr__(self):
+        return "<LazyFunction %s of %r>" % (self._name, self._library)
+
+class LazyLibrary(object):
+    """Native library which is loaded on the first call of its functions.
+    Attribute access returns a function shared by every caller, as with `ctypes.CDLL', and
+    subscription returns a new function which can have its own prototype.
+    """
+
+    def __init__(self, names, find, env):
+        """Declare a library.
+        `names' specifies an array of candidate names passed to `ctypes.CDLL' in order.
+        `find' specifies the name passed to `ctypes.util.find_library' if no candidate can be
+        loaded.
+        `env' specifies the name of an environment variable overriding the candidates.
+        """
+        object.__setattr__(self, "_names", list(names))
+        object.__setattr__(self, "_find", find)
+        object.__setattr__(self, "_env", env)
+        object.__setattr__(self, "_path", None)
+        object.__setattr__(self, "_dll", None)
+        object.__setattr__(self, "_funcs", [])
+        object.__setattr__(self, "_namespaces", [])
+        object.__setattr__(self, "eager", os.environ.get("ESTRAIER_EAGER", "0") not in ("", "0"))
+
+    def set_path(self, path):
+        """Set the path of the library.
+        `path' specifies the path given to `ctypes.CDLL'.
+        `RuntimeError' is raised if another library is already loaded.
+        """
+        if self._dll is not None and path != self._path:
+            raise RuntimeError("the library is already loaded: %s" % self._path)
+        object.__setattr__(self, "_path", path)
+
+    def loaded(self):
+        """Check whether the library is loaded.
+        The return value is true if the library is loaded, else it is false.
+        """
+        return self._dll is not None
+
+    def load(self):
+        """Load the library.
+        The return value is the `ctypes.CDLL' object.  `OSError' is raised if no candidate can
+        be loaded.
+        """
+        dll = self._dll
+        if dll is not None:
+            return dll
+        path = self._path or os.environ.get(self._env)
+        if path:
+            candidates = [path]
+        else:
+            # looking up the library is slow, so it is done only if the usual names fail
+            candidates = self._names + [self._find_library]
+        error = None
+        for name in candidates:
+            if callable(name):
+                name = name()
+            if not name:
+                continue
+            try:
+                dll = ctypes.CDLL(name)
+            except OSError as e:
+                error = e
+                continue
+            object.__setattr__(self, "_path", name)
+            object.__setattr__(self, "_dll", dll)
+            return dll
+        raise error or OSError("library not found: %s" % ", ".join(self._names))
+
+    def _find_library(self):
+        import ctypes.util
+        return ctypes.util.find_library(self._find)
+
+    def resolve_all(self):
+        """Resolve every function declared so far.
+        """
+        for func in list(self._funcs):
+            func.resolve()
+    
+    def rebind(self, namespace):
+        """Register a namespace holding functions of the library.
+        `namespace' specifies a dictionary such as `globals()' of a module.  Each function in it
+        is replaced with the ctypes function as soon as it is resolved, so that the proxy is
+        called only once.
+        """
+        self._namespaces.append(namespace)
+        for key, value in list(namespace.items()):
+            if isinstance(value, LazyFunction) and value._func is not None:
+                namespace[key] = value._func
+    
+    def _replace(self, func):
+        # replace a resolved proxy in the registered namespaces and in the library object
+        for namespace in self._namespaces:
+            for key, value in list(namespace.items()):
+                if value is func:
+                    namespace[key] = func._func
+        if func._shared:
+            object.__setattr__(self, func._name, func._func)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        func = LazyFunction(self, name, True)
+        # a function resolved eagerly is cached as is
+        object.__setattr__(self, name, func if func._func is None else func._func)
+        self._funcs.append(func)
+        return func
+
+    def __getitem__(self, name):
+        func = LazyFunction(self, name, False)
+        self._funcs.append(func)
+        return func
+
+    def __repr__(self):
+        return "<LazyLibrary %s>" % (self._path or self._names[0])
+
+libestraier = LazyLibrary(["libestraier.so"], "estraier", "ESTRAIER_LIBRARY")
+libc = LazyLibrary(["libc.so", "libc.so.6"], "c", "ESTRAIER_LIBC")
+
+def init(path=None, libc_path=None, eager=False):
+    """Configure the native libraries.
+    `path' specifies the path of libestraier.  If it is `None', the current setting is kept.
+    `libc_path' specifies the path of the C library.  If it is `None', the current setting is
+    kept.
+    `eager' specifies whether to load the libraries and resolve every declared function now.
+    `RuntimeError' is raised if a library is already loaded from another path.
+    """
+    if path is not None:
+        libestraier.set_path(path)
+    if libc_path is not None:
+        libc.set_path(libc_path)
+    if eager:
+        for library in (libestraier, libc):
+            object.__setattr__(library, "eager", True)
+            library.resolve_all()
@@ -0,0 +1,175 @@
+import multiprocessing
+import queue
+
+from estraier_c import Document, Database, _to_draft
+
+def _to_drafts(prepared):
+    if prepared is None:
+        return []
+    if isinstance(prepared, (Document, bytes, str)):
+        prepared = [prepared]
+    return [_to_draft(doc) for doc in prepared]
+
+def _prepare_worker(prepare, inqueue, outqueue, finished):
+    while True:
+        sources = inqueue.get()
+        if sources is None:
+            # a worker exiting without this flag died in the middle of the sources
+            finished.set()
+            return
+        drafts = []
+        skipped = 0
+        errors = 0
+        for source in sources:
+            try:
+                prepared = _to_drafts(prepare(source))
+            except Exception:
+                errors += 1
+                continue
+            if prepared:
+                drafts.extend(prepared)
+            else:
+                skipped += 1
+        outqueue.put((drafts, skipped, errors))
+
+def _write_worker(name, omode, options, flush_every, high_water, outqueue, resqueue):
+    stats = {"put": 0, "failed": 0, "skipped": 0, "errors": 0, "opened": False}
+    db = Database()
+    opened = db.open(name, omode)
+    stats["opened"] = opened
+    while True:
+        batch = outqueue.get()
+        if batch is None:
+            break
+        drafts, skipped, errors = batch
+        stats["skipped"] += skipped
+        stats["errors"] += errors
+        if not opened:
+            # keep draining so that the workers are never blocked
+            stats["failed"] += len(drafts)
+            continue
+        for rv in db.put_docs(drafts, options, flush_every, high_water=high_water):
+            if rv:
+                stats["put"] += 1
+            else:
+                stats["failed"] += 1
+    if opened and not db.close():
+        stats["opened"] = False
+    resqueue.put(stats)
+
+class IndexPipeline(object):
+    """Pipeline to prepare documents in parallel and register them with one writer.
+    Sources are sent in batches to a pool of worker processes which turn them into draft data,
+    and one writer process, the only one opening the database as a writer, registers the drafts
+    with `Database.put_docs'.  The queues between the stages are bounded, so a slow writer
+    blocks the workers and slow workers block the feeder.
+    """
+
+    def __init__(self, name, prepare, omode=Database.DBWRITER | Database.DBCREAT,
+                 options=Database.PDCLEAN, workers=None, batch_size=100, queue_size=None,
+                 flush_every=0, high_water=0):
+        """Create a pipeline.
+        `name' specifies the name of a database directory.
+        `prepare' specifies a function called in the workers with each source.  It should
+        return a document object, draft data, an array of them, or `None' to skip the source.
+        It must be picklable, that is, defined at the top level of a module.
+        `omode' specifies open modes of the writer.  `Database.DBWRITER' is required.
+        `options' specifies options of `Database.put_docs'.
+        `workers' specifies the number of worker processes.  If it is `None', the number of CPUs
+        is used.
+        `batch_size' specifies the number of sources in each batch sent to a worker.
+        `queue_size' specifies the maximum number of batches waiting in each queue.  If it is
+        `None', twice the number of workers is used.
+        `flush_every' specifies `flush_every' of `Database.put_docs'.
+        `high_water' specifies `high_water' of `Database.put_docs'.
+        """
+        self._name = name
+        self._prepare = prepare
+        self._omode = omode
+        self._options = options
+        self._workers = workers or multiprocessing.cpu_count()
+        self._batch_size = max(batch_size, 1)
+        self._queue_size = queue_size or self._workers * 2
+        self._flush_every = flush_every
+        self._high_water = high_water
+
+    def run(self, sources):
+        """Prepare and register documents.
+        `sources' specifies an iterable of arbitrary picklable objects passed to `prepare'.
+        The return value is a hash object of statistics: `put' is the number of registered
+        documents, `failed' is the number of documents which could not be registered,
+        `skipped' is the number of sources for which nothing was prepared, `errors' is the
+        number of sources for which `prepare' raised an exception, and `opened' is whether the
+        database was opened and closed successfully.
+        `RuntimeError' is raised if a worker or the writer exits unexpectedly, after the other
+        processes are terminated.
+        """
+        inqueue = multiprocessing.Queue(self._queue_size)
+        outqueue = multiprocessing.Queue(self._queue_size)
+        resqueue = multiprocessing.Queue()
+        writer = multiprocessing.Process(
+            target=_write_worker,
+            args=(self._name, self._omode, self._options, self._flush_every, self._high_water,
+                  outqueue, resqueue))
+        writer.start()
+        workers = []
+        for i in range(self._workers):
+            finished = multiprocessing.Event()
+            worker = multiprocessing.Process(target=_prepare_worker,
+                                             args=(self._prepare, inqueue, outqueue, finished))
+            worker.start()
+            workers.append((worker, finished))
+
+        def check():
+            if not writer.is_alive():
+                raise RuntimeError("the writer process exited unexpectedly")
+            for worker, finished in workers:
+                if not worker.is_alive() and not finished.is_set():
+                    raise RuntimeError("a worker process exited unexpectedly: %s" %
+                                       worker.exitcode)
+
+        def put(target, value):
+            # a bounded queue may never drain if a process on the other side is dead
+            while True:
+                check()
+                try:
+                    target.put(value, timeout=1.0)
+                    return
+                except queue.Full:
+                    pass
+
+        try:
+            batch = []
+            for source in sources:
+                batch.append(source)
+                if len(batch) >= self._batch_size:
+                    put(inqueue, batch)
+                    batch = []
+            if batch:
+                put(inqueue, batch)
+            for worker in workers:
+                put(inqueue, None)
+            for worker, finished in workers:
+                while worker.is_alive() or not finished.is_set():
+                    check()
+                    worker.join(1.0)
+            # every draft is in the queue once the workers have exited
+            put(outqueue, None)
+            stats = None
+            while stats is None:
+                try:
+                    stats = resqueue.get(timeout=1.0)
+                except queue.Empty:
+                    if not writer.is_alive():
+                        # the writer may have exited right after sending the statistics
+                        try:
+                            stats = resqueue.get(timeout=1.0)
+                        except queue.Empty:
+                            check()
+        except BaseException:
+            for process in [writer] + [worker for worker, finished in workers]:
+                if process.is_alive():
+                    process.terminate()
+            raise
+        writer.join()
+        return stats
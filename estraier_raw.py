@@ -13,11 +13,11 @@
 # Boston, MA 02111-1307 USA.
 ################################################################################################
 
-from ctypes import CDLL, POINTER
+from ctypes import POINTER
 from ctypes import c_int, c_long, c_ulong, c_double, c_size_t
 from ctypes import c_char_p, c_void_p
 
-libest_raw = CDLL("libestraier.so")
+from estraier_lib import libestraier as libest_raw
 
 ############################################################
 # API for document
@@ -1901,3 +1901,6 @@ est_vector_cosine.__doc__ = \
     "The return value is the cosine of the angle of two vectors."
 est_vector_cosine.restype = c_double
 est_vector_cosine.argtypes = [POINTER(c_int), POINTER(c_int), c_int]
+
+# calls after the first one go to ctypes directly
+libest_raw.rebind(globals())
@@ -0,0 +1,178 @@
+import time
+
+from estraier_c import Condition
+
+# defaults of `Database.set_cache_size'
+_DEFAULTS = {"size": 64 * 1024 * 1024, "anum": 8192, "tnum": 1024, "rnum": 256}
+
+# bytes assumed for a record when no document can be sampled
+_RECORD_SIZES = {"anum": 512, "tnum": 4096, "rnum": 1024}
+
+def percentile(values, ratio):
+    """Get a percentile by the nearest rank.
+    `values' specifies an array of numbers.
+    `ratio' specifies the rank between 0.0 and 1.0.
+    The return value is the percentile or `None' if `values' is empty.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(ratio * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+class CacheTuner(object):
+    """Tuner of cache sizes of a database measured with a workload.
+    Starting from the defaults, the numbers of cached records for attributes, texts and
+    occurrence results are doubled one by one while the latency of the workload improves and
+    the estimated memory stays within the budget.  The rest of the budget is given to the index
+    cache, which holds index words of a writer.
+    """
+
+    def __init__(self, db, budget, min_gain=0.05, max_steps=6, min_index=16 * 1024 * 1024):
+        """Create a tuner.
+        `db' specifies an opened database object.
+        `budget' specifies the memory budget of the caches in bytes.
+        `min_gain' specifies the minimum ratio by which the mean latency should improve for a
+        larger cache to be taken.
+        `max_steps' specifies the maximum number of times each number of records is doubled.
+        `min_index' specifies the size of the index cache reserved out of the budget.
+        """
+        self._db = db
+        self._budget = budget
+        self._min_index = min_index
+        self._min_gain = min_gain
+        self._max_steps = max_steps
+        self._record_sizes = dict(_RECORD_SIZES)
+        self.samples = []
+
+    def sample(self, workload, config=None):
+        """Run a workload and take statistics.
+        `workload' specifies an array of search phrases or of condition objects.
+        `config' specifies a hash object of `size', `anum', `tnum' and `rnum' set with
+        `Database.set_cache_size' before the run.  If it is `None', the current setting is kept.
+        The workload runs twice, once to fill the caches and once to measure the latency.
+        The return value is a hash object of the setting, the latency in milliseconds, the number
+        of records and the size of the used cache region and the load ratio of the memory.  It
+        is also appended to `samples'.
+        """
+        db = self._db
+        conds = self._conditions(workload)
+        if config is not None:
+            db.set_cache_size(config["size"], config["anum"], config["tnum"], config["rnum"])
+            db.refresh_rescc()
+        # the result cache of Python would hide the native caches
+        hits = 0
+        for cond in conds:
+            hits += db.search(cond, hints=False, cache=False).doc_num()
+        latencies = []
+        for cond in conds:
+            start = time.perf_counter()
+            db.search(cond, hints=False, cache=False)
+            latencies.append(time.perf_counter() - start)
+        rv = {
+            "config": dict(config) if config is not None else None,
+            "queries": len(conds),
+            "hits": hits,
+            "mean_ms": sum(latencies) * 1000.0 / len(latencies) if latencies else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000.0 if latencies else 0.0,
+            "p99_ms": percentile(latencies, 0.99) * 1000.0 if latencies else 0.0,
+            "cache_num": db.cache_num(),
+            "used_cache_size": db.used_cache_size(),
+            "memory_usage": db.memory_usage(),
+        }
+        self.samples.append(rv)
+        return rv
+
+    def estimate(self, config):
+        """Estimate the memory used by the caches.
+        `config' specifies a hash object of `size', `anum', `tnum' and `rnum'.
+        The return value is the estimated size in bytes.  The size of a record is measured from
+        documents hit by the workload given to `recommend'.
+        """
+        return config["size"] + sum(config[key] * self._record_sizes[key]
+                                    for key in ("anum", "tnum", "rnum"))
+
+    def recommend(self, workload):
+        """Search for cache sizes for a workload.
+        `workload' specifies an array of search phrases or of condition objects.
+        The return value is a hash object of `size', `anum', `tnum' and `rnum', or `None' if even
+        the defaults and the reserved index cache do not fit in the budget.  The setting of the
+        database is left as the last sample.
+        """
+        conds = self._conditions(workload)
+        self._measure_records(conds)
+        config = dict(_DEFAULTS)
+        # trials are counted with the index cache they run with, which is the current one
+        # unless it leaves too little of the budget, and at least the reserved size
+        config["size"] = max(self._db.cache_size(), self._min_index)
+        if self.estimate(config) > self._budget:
+            config["size"] = self._min_index
+            if self.estimate(config) > self._budget:
+                return None
+        best = self.sample(conds, config)["mean_ms"]
+        for key in ("anum", "rnum", "tnum"):
+            for i in range(self._max_steps):
+                trial = dict(config)
+                trial[key] *= 2
+                if self.estimate(trial) > self._budget:
+                    break
+                mean = self.sample(conds, trial)["mean_ms"]
+                if mean > best * (1.0 - self._min_gain):
+                    break
+                config = trial
+                best = mean
+        # the rest is at least the reserved size since every trial fits in the budget
+        config["size"] += self._budget - self.estimate(config)
+        return config
+
+    def tune(self, workload, apply=True):
+        """Recommend cache sizes and apply them.
+        `workload' specifies an array of search phrases or of condition objects.
+        `apply' specifies whether to set the recommended sizes to the database.
+        The return value is a hash object of the recommended setting as `config', its estimated
+        memory as `estimated', the high water mark for `Database.put_docs' as `high_water', and
+        the samples as `samples'.  `config' is `None' if even the defaults do not fit in the
+        budget.
+        """
+        config = self.recommend(workload)
+        if config is not None and apply:
+            self._db.set_cache_size(config["size"], config["anum"], config["tnum"],
+                                    config["rnum"])
+        return {
+            "config": config,
+            "estimated": self.estimate(config) if config is not None else None,
+            "high_water": config["size"] * 3 // 4 if config is not None else 0,
+            "samples": self.samples,
+        }
+
+    def _conditions(self, workload):
+        conds = []
+        for query in workload:
+            if isinstance(query, Condition):
+                conds.append(query)
+            else:
+                cond = Condition()
+                cond.set_phrase(query)
+                conds.append(cond)
+        return conds
+
+    def _measure_records(self, conds, num=100):
+        # estimate the size of records of each cache from documents hit by the workload
+        db = self._db
+        ids = []
+        hits = []
+        for cond in conds:
+            result = db.search(cond, hints=False, cache=False)
+            hits.append(result.doc_num())
+            if len(ids) < num:
+                ids.extend(result.get_doc_ids(0, num - len(ids)))
+        docs = [doc for doc in db.get_docs(ids, None, texts=True) if doc is not None]
+        if docs:
+            attrs = sum(sum(len(name) + len(doc.attr(name) or "") for name in doc.attr_names())
+                        for doc in docs)
+            texts = sum(len(doc.cat_texts()) for doc in docs)
+            self._record_sizes["anum"] = max(attrs // len(docs), 1)
+            self._record_sizes["tnum"] = max(texts // len(docs), 1)
+        if hits:
+            # an occurrence result holds the ID number and the score of each document
+            self._record_sizes["rnum"] = max(sum(hits) * 8 // len(hits), 8)
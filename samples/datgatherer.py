@@ -135,7 +135,7 @@ if __name__ == "__main__":
                                 if d.formedbody:
                                     for fb in d.formedbody:
                                         doc.add_text(fb)
-                                db.put_doc(doc, Database.PDCLEAN)
+                                db.put_doc(doc, Database.PDCLEAN, incremental=True)
                             except ValueError as e:
                                 print(e, file=sys.stderr)
                             i += 1
@@ -25,21 +25,20 @@ if __name__=="__main__":
     # get the result of search
     result = db.search(cond)
     
+    # retrieve the attributes and the body text of the documents in the result
+    docs = db.get_docs(result.get_doc_ids(), ["@uri", "@title"], texts=True)
+    
     # for each document in the result
-    dnum = result.doc_num()
-    for i in range(dnum):
-        # retrieve the document object
-        doc = db.get_doc(result.get_doc_id(i), 0)
+    for doc in docs:
         if doc:
+            (id, uri, title, texts) = doc
             # display attributes
-            uri = doc.attr("@uri")
             if uri:
                 print("URI: %s" % uri)
-            title = doc.attr("@title")
             if title:
                 print("Title: %s" % title)
             # display the body text
-            for text in doc.texts():
+            for text in texts:
                 print("%s" % text)
     
     # close the database
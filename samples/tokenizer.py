@@ -0,0 +1,51 @@
+#! /usr/local/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import shutil
+import sys
+import tempfile
+
+from cabin_raw import cblistopen, cblistnum, cblistval, cblistclose
+from estraier_raw import est_break_text_chrcat
+from estraier_c import Database
+
+TEXTS = [
+    "Somewhere over the rainbow.  Way up high.",
+    "There's a land that I heard of once in a lullaby.",
+    "虹の彼方に 空高く",
+]
+
+def break_one(text):
+    # break a text with the native analyzer directly
+    listNative = cblistopen()
+    est_break_text_chrcat(text.encode("utf-8"), listNative, 1)
+    rv = [cblistval(listNative, i, None).decode("utf-8") for i in range(cblistnum(listNative))]
+    cblistclose(listNative)
+    return rv
+
+if __name__=="__main__":
+    # break several texts in one call with a database of the character category analyzer,
+    # and compare each of them with the native analyzer called on its own
+    tmpdir = tempfile.mkdtemp(prefix="esttokenizer")
+    try:
+        db = Database()
+        if not db.open(tmpdir + "/casket",
+                       Database.DBWRITER | Database.DBCREAT | Database.DBCHRCAT):
+            print("error: %s" % db.err_msg(db.error()), file=sys.stderr)
+            sys.exit(1)
+        tokens = db.break_texts(TEXTS)
+        db.close()
+        failed = False
+        for i, text in enumerate(TEXTS):
+            expected = break_one(text)
+            actual = tokens.text_tokens(i)
+            if actual != expected:
+                print("mismatch in text %d: %r != %r" % (i, actual, expected), file=sys.stderr)
+                failed = True
+        if failed:
+            sys.exit(1)
+        print("ok: %d tokens in %d texts" % (len(tokens), len(TEXTS)))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)